@@ -0,0 +1,55 @@
+import pygame
+
+class AssetManager:
+    def __init__(self):
+        # Loaded surfaces, keyed by (path, alpha)
+        self.surfaces = {}
+
+        # Cache statistics
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path, alpha=False):
+        """Returns the shared surface for an image, loading it from disk only once
+
+        Opaque images are converted with convert(), sprites (alpha=True) with convert_alpha(),
+        so every blit happens in the display pixel format. The display mode must be set first.
+        """
+        key = (path, alpha)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        image = pygame.image.load(path)
+        surface = image.convert_alpha() if alpha else image.convert()
+        self.surfaces[key] = surface
+        return surface
+
+    def image(self, path):
+        """Returns an opaque image in display format"""
+        return self.load(path, alpha=False)
+
+    def sprite(self, path):
+        """Returns an image with per-pixel alpha in display format"""
+        return self.load(path, alpha=True)
+
+    def bytes_held(self):
+        """Returns the number of pixel bytes held by cached surfaces"""
+        return sum(surface.get_pitch() * surface.get_height() for surface in self.surfaces.values())
+
+    def stats(self):
+        """Returns cache hits, misses and bytes held"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'surfaces': len(self.surfaces),
+            'bytes': self.bytes_held()
+        }
+
+    def summary(self):
+        """Returns a one-line description of the cache state"""
+        stats = self.stats()
+        return (f"assets: {stats['surfaces']} surfaces, {stats['bytes'] / (1024 * 1024):.1f} MiB, "
+                f"{stats['hits']} hits, {stats['misses']} misses")
@@ -0,0 +1,86 @@
+import math
+import pygame
+from constants import *
+
+# Horizontally scrolling background layer
+#
+# The layer image is pre-tiled (alternately mirrored, so any image wraps without a seam) into a
+# strip at least as wide as the screen. Any scroll offset is then covered by at most two blits.
+class ParallaxLayer:
+    def __init__(self, image, top, parallax, spacing, width=SCREEN_WIDTH, horizon=BACKGROUND_HORIZON):
+        # Pixels scrolled per world unit of camera movement
+        self.parallax = parallax
+        self.y = top
+        self.width = width
+
+        # Rows below the horizon are always covered by the road
+        height = max(1, min(image.get_height(), horizon - top))
+
+        # Tile the image and its mirror image until the strip covers the screen
+        tiles = [image, pygame.transform.flip(image, True, False)]
+        tile_width = image.get_width() + spacing
+        count = 2 * math.ceil(width / (2 * tile_width))
+        self.strip = pygame.Surface((count * tile_width, height), pygame.SRCALPHA).convert_alpha()
+        self.strip.fill((0, 0, 0, 0))
+        for i in range(count):
+            self.strip.blit(tiles[i % 2], (i * tile_width, 0))
+
+    def render(self, screen, camera_x):
+        """Draws the layer scrolled for the camera position"""
+        width = self.strip.get_width()
+        x = -(int(camera_x * self.parallax) % width)
+        screen.blit(self.strip, (x, self.y))
+        if x + width < self.width:
+            screen.blit(self.strip, (x + width, self.y))
+
+class Background:
+    def __init__(self, assets):
+        self.assets = assets
+
+        # Static composite and moving layers for each surface size drawn to (the full screen, or
+        # smaller surfaces when rendering at reduced resolution)
+        self.views = {}
+        self.static, self.layers = self.view((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+        # Whether the moving layers are drawn
+        self.moving_layers = True
+
+    def view(self, size):
+        """Returns the static composite and moving layers for a surface size, building them on first use"""
+        if size in self.views:
+            return self.views[size]
+
+        width, height = size
+        scale = height / SCREEN_HEIGHT
+
+        # Static layers, composited once into one opaque surface in display format
+        static = pygame.Surface(size).convert()
+        static.fill((0, 0, 0))
+        for path, top in BACKGROUND_STATIC_LAYERS:
+            image = self.assets.sprite(path)
+            if scale != 1:
+                image = pygame.transform.smoothscale(image, (round(image.get_width() * scale),
+                                                             round(image.get_height() * scale)))
+            static.blit(image, (0, round(top * scale)))
+
+        # Moving layers, drawn over the static ones from far to near
+        layers = []
+        for path, layer_height, top, parallax, spacing in BACKGROUND_MOVING_LAYERS:
+            image = self.assets.sprite(path)
+            layer_height = round(layer_height * scale)
+            if layer_height != image.get_height():
+                layer_width = round(image.get_width() * layer_height / image.get_height())
+                image = pygame.transform.smoothscale(image, (layer_width, layer_height))
+            layers.append(ParallaxLayer(image, round(top * scale), parallax * scale, round(spacing * scale),
+                                        width, round(BACKGROUND_HORIZON * scale)))
+
+        self.views[size] = static, layers
+        return static, layers
+
+    def render(self, screen, camera_x):
+        """Draws the background for the camera position (covers the whole screen)"""
+        static, layers = self.view(screen.get_size())
+        screen.blit(static, (0, 0))
+        if self.moving_layers:
+            for layer in layers:
+                layer.render(screen, camera_x)
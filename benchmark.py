@@ -0,0 +1,220 @@
+# benchmark.py
+# Headless frame benchmark: runs the game's update/render loop under the SDL dummy video driver
+# with scripted driving and no frame cap, for every level.
+#
+#   python benchmark.py --frames 600 --output bench.json
+#   python benchmark.py --baseline bench_baseline.json --tolerance 0.15
+#   python benchmark.py --sim-only --steps 100000
+#   python benchmark.py --pipelined --output bench_pipelined.json
+#   python benchmark.py --road banded --profile
+#
+# A run fails (exit status 1) when any timing exceeds the baseline by more than the tolerance.
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import sys
+import time
+import pygame
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, SIM_DT, ROAD_RENDERER
+from assets import AssetManager
+from background import Background
+from simulation import Simulation, ScriptedInput, DRIVING_SCRIPT
+from pipeline import SimulationPipeline
+from main import LEVELS, setup_game, update_view, render_scene, simulate
+from timestep import FixedTimestep
+from profiler import profiler, STAGE_WAIT, STAGE_FLIP
+
+# Timings compared against the baseline
+CHECKED_METRICS = ('mean', 'p95', 'update_mean', 'render_mean')
+
+# Simulated frame time (the game targets 60 FPS)
+FRAME_DT = 1 / 60
+
+def percentile(sorted_values, percent):
+    """Returns the nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_level(screen, assets, background, level, frames, warmup, seed, start, profile=False, endless=False,
+              pipelined=False, road_renderer=ROAD_RENDERER):
+    """Runs a scripted drive on one level and returns its timing statistics in milliseconds
+
+    With pipelined set, the steps run on a worker thread while the previous state is drawn, as in
+    main.py --pipelined; update_mean is then the time spent waiting for them and snapshotting.
+    """
+    circuit, camera, player = setup_game(assets, level, seed, endless)
+    circuit.road_renderer = road_renderer
+
+    # Start just before the traffic so every frame has cars to draw
+    player.z = start * circuit.road_length
+    driver = ScriptedInput(DRIVING_SCRIPT)
+    timestep = FixedTimestep()
+    simulation = Simulation(circuit, player, lap=None if pipelined else profiler.lap_stage)
+    pipeline = SimulationPipeline(simulation, play_through=True) if pipelined else None
+    view_alpha = 0.0
+    obstacles = None
+
+    frame_times = []
+    update_times = []
+    render_times = []
+    collisions = 0
+
+    for frame in range(warmup + frames):
+        pygame.event.pump()
+
+        # Time the stages of the measured frames only
+        if profile and frame == warmup:
+            profiler.enable()
+            profiler.reset()
+
+        start = time.perf_counter()
+        profiler.begin_frame()
+        if pipeline is not None:
+            pipeline.wait()
+            profiler.lap(STAGE_WAIT)
+            update_view(view_alpha, circuit, camera, player)
+            obstacles = circuit.obstacles.snapshot()
+            pipeline.start([driver.next() for _ in range(timestep.advance(FRAME_DT))])
+            view_alpha = timestep.alpha()
+        else:
+            for _ in range(timestep.advance(FRAME_DT)):
+                if simulation.step(driver.next()):
+                    collisions += 1
+            update_view(timestep.alpha(), circuit, camera, player)
+        updated = time.perf_counter()
+        render_scene(screen, background, circuit, camera, player, obstacles=obstacles)
+        pygame.display.flip()
+        profiler.lap(STAGE_FLIP)
+        profiler.end_frame()
+        end = time.perf_counter()
+
+        if frame >= warmup:
+            frame_times.append((end - start) * 1000)
+            update_times.append((updated - start) * 1000)
+            render_times.append((end - updated) * 1000)
+
+    if pipeline is not None:
+        pipeline.close()
+        collisions = pipeline.collisions
+
+    frame_times.sort()
+    mean = sum(frame_times) / len(frame_times)
+    stats = {
+        'frames': frames,
+        'mean': mean,
+        'p50': percentile(frame_times, 50),
+        'p95': percentile(frame_times, 95),
+        'p99': percentile(frame_times, 99),
+        'fps': 1000 / mean if mean > 0 else 0.0,
+        'update_mean': sum(update_times) / len(update_times),
+        'render_mean': sum(render_times) / len(render_times),
+        'collisions': collisions,
+        'sprite_cache': circuit.sprite_cache.stats()
+    }
+    if profile:
+        profiler.enable(False)
+        stats['stages'] = {stage: times['mean'] for stage, times in profiler.summary().items()}
+    return stats
+
+def run_simulation(assets, level, steps, seed, start, endless=False):
+    """Runs simulation steps only, as fast as possible, and returns the step rate"""
+    circuit, camera, player = setup_game(assets, level, seed, endless)
+    player.z = start * circuit.road_length
+    driver = ScriptedInput(DRIVING_SCRIPT)
+
+    begin = time.perf_counter()
+    collisions = simulate(Simulation(circuit, player), steps, driver)
+    elapsed = time.perf_counter() - begin
+
+    return {
+        'steps': steps,
+        'step_us': elapsed / steps * 1e6,
+        'steps_per_second': steps / elapsed,
+        'simulated_seconds': steps * SIM_DT,
+        'collisions': collisions
+    }
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regressions of results against a baseline"""
+    regressions = []
+    for name, stats in results['levels'].items():
+        reference = baseline.get('levels', {}).get(name)
+        if reference is None:
+            continue
+        for metric in CHECKED_METRICS:
+            if metric in reference and stats[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {stats[metric]:.3f} ms > baseline {reference[metric]:.3f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless end-to-end frame benchmark")
+    parser.add_argument('--frames', type=int, default=600, help="measured frames per level")
+    parser.add_argument('--warmup', type=int, default=60, help="unmeasured frames before measuring")
+    parser.add_argument('--levels', nargs='+', default=list(LEVELS), choices=list(LEVELS))
+    parser.add_argument('--seed', type=int, default=1, help="obstacle placement seed")
+    parser.add_argument('--start', type=float, default=0.15, help="starting position as a fraction of the track")
+    parser.add_argument('--output', default='bench_output.json', help="where to write the results")
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed slowdown (0.15 = 15%%)")
+    parser.add_argument('--sim-only', action='store_true', help="run simulation steps only, without rendering")
+    parser.add_argument('--steps', type=int, default=100000, help="simulation steps per level with --sim-only")
+    parser.add_argument('--endless', action='store_true', help="drive the endless streamed road")
+    parser.add_argument('--profile', action='store_true', help="also record the mean time of every frame stage")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="step the simulation on a worker thread while drawing, as main.py --pipelined")
+    parser.add_argument('--road', choices=['batched', 'segments', 'banded'], default=ROAD_RENDERER,
+                        help="road renderer")
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    assets = AssetManager()
+    background = Background(assets)
+
+    results = {
+        'screen': [SCREEN_WIDTH, SCREEN_HEIGHT],
+        'driver': pygame.display.get_driver(),
+        'endless': args.endless,
+        'pipelined': args.pipelined,
+        'road_renderer': args.road,
+        'levels': {}
+    }
+    if args.sim_only:
+        for name in args.levels:
+            stats = run_simulation(assets, LEVELS[name], args.steps, args.seed, args.start, args.endless)
+            results['levels'][name] = stats
+            print(f"{name:>6}: {stats['step_us']:.1f} us/step  ({stats['steps_per_second']:.0f} steps/s, "
+                  f"{stats['simulated_seconds'] / (stats['steps'] / stats['steps_per_second']):.0f}x real time)")
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        pygame.quit()
+        return
+
+    for name in args.levels:
+        stats = run_level(screen, assets, background, LEVELS[name], args.frames, args.warmup, args.seed, args.start,
+                          args.profile, args.endless, args.pipelined, args.road)
+        results['levels'][name] = stats
+        print(f"{name:>6}: mean {stats['mean']:.2f} ms  p50 {stats['p50']:.2f}  p95 {stats['p95']:.2f}  "
+              f"p99 {stats['p99']:.2f}  ({stats['fps']:.0f} fps)")
+        if args.profile:
+            print("        " + "  ".join(f"{stage} {ms:.2f}" for stage, ms in stats['stages'].items()))
+    results['assets'] = assets.stats()
+    pygame.quit()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
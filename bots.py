@@ -0,0 +1,89 @@
+# bots.py
+# Computer drivers for headless runs (sweep.py and tests). They are input providers like the
+# keyboard, deciding from the simulation state instead of keys.
+import math
+import random
+from constants import BOT_LOOKAHEAD, BOT_REACTION, LANE_OFFSET
+from simulation import InputProvider, ScriptedInput, DRIVING_SCRIPT, INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT
+
+# Lane numbers (lane centers are at lane * LANE_OFFSET in player x)
+LANES = (-1, 0, 1)
+
+# Lane-keeping driver that dodges traffic
+#
+# Every `reaction` steps it looks `lookahead` segments ahead, picks the lane whose nearest car is
+# farthest away (staying in its lane on a tie), and brakes while the car in the chosen lane is
+# closer than `brake_distance`. Between decisions it steers towards the chosen lane's center.
+class AvoidingDriver(InputProvider):
+    def __init__(self, simulation, lookahead=BOT_LOOKAHEAD, reaction=BOT_REACTION, brake_distance=400):
+        self.simulation = simulation
+        self.lookahead = lookahead
+        self.reaction = reaction
+        self.brake_distance = brake_distance
+
+        # Chosen lane, whether to brake, and steps until the next decision
+        self.target = 0
+        self.brake = False
+        self.countdown = 0
+
+    def clearances(self):
+        """Returns the distance to the nearest car ahead in each lane (infinite when clear)"""
+        circuit, player = self.simulation.circuit, self.simulation.player
+        cars = circuit.obstacles
+        ahead = cars.in_segments(circuit.get_segment_index(player.z), self.lookahead)
+        gaps = (cars.z[ahead] - player.z) % circuit.road_length
+        lanes = cars.lane[ahead]
+        clear = {}
+        for lane in LANES:
+            lane_gaps = gaps[lanes == lane]
+            clear[lane] = float(lane_gaps.min()) if len(lane_gaps) else math.inf
+        return clear
+
+    def decide(self):
+        """Picks the target lane and whether to brake"""
+        clear = self.clearances()
+        best = max(LANES, key=lambda lane: (clear[lane], lane == self.target))
+        if clear[best] > clear[self.target]:
+            self.target = best
+        self.brake = clear[self.target] < self.brake_distance
+
+    def next(self):
+        if self.countdown <= 0:
+            self.decide()
+            self.countdown = self.reaction
+        self.countdown -= 1
+
+        mask = INPUT_DOWN if self.brake else INPUT_UP
+        x = self.simulation.player.x
+        target_x = self.target * LANE_OFFSET
+        if x < target_x - 0.05:
+            mask |= INPUT_RIGHT
+        elif x > target_x + 0.05:
+            mask |= INPUT_LEFT
+        return mask
+
+class RandomDriver(InputProvider):
+    """Mostly accelerates, holding random steering for random stretches (seeded)"""
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.mask = 0
+        self.hold = 0
+
+    def next(self):
+        if self.hold <= 0:
+            self.mask = INPUT_UP if self.rng.random() < 0.8 else INPUT_DOWN
+            self.mask |= self.rng.choice((0, 0, INPUT_LEFT, INPUT_RIGHT))
+            self.hold = self.rng.randint(10, 90)
+        self.hold -= 1
+        return self.mask
+
+# Bot constructors by name, each taking the simulation and a seed
+BOTS = {
+    'avoid': lambda simulation, seed: AvoidingDriver(simulation),
+    'random': lambda simulation, seed: RandomDriver(seed),
+    'script': lambda simulation, seed: ScriptedInput(DRIVING_SCRIPT)
+}
+
+def create_bot(name, simulation, seed=None):
+    """Returns the named bot driving a simulation"""
+    return BOTS[name](simulation, seed)
@@ -4,7 +4,10 @@ class Camera:
     def __init__(self):
         # Camera world coordinates
         self.x = 0
-        self.y = 1000  # Height above road
+        self.y = 1000
+        
+        # Height above the road
+        self.height = 1000
         self.z = 0
         
         # Z-distance between camera and player
@@ -15,19 +18,26 @@ class Camera:
     
     def init(self):
         """Initialize camera (must be called when initializing game or changing settings)"""
-        self.dist_to_plane = 1 / (self.y / self.dist_to_player)
+        self.dist_to_plane = 1 / (self.height / self.dist_to_player)
     
     def update(self, player, circuit):
         """Update camera position to follow the player"""
+        self.follow(player.x, player.z, circuit)
+    
+    def follow(self, player_x, player_z, circuit):
+        """Place the camera behind a player position"""
         # Since player X is normalized within [-1, 1], camera X must be multiplied by road width
-        self.x = player.x * circuit.road_width
+        self.x = player_x * circuit.road_width
         
         # Place the camera behind the player at the desired distance
-        self.z = player.z - self.dist_to_player
+        self.z = player_z - self.dist_to_player
         
         # Don't let camera Z go negative
         if self.z < 0:
             self.z += circuit.road_length
+        
+        # Stay the same height above the road under the player as it rises and falls
+        self.y = self.height + circuit.height_at(player_z)
 
 
 
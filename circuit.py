@@ -1,296 +1,347 @@
 import pygame
-import random
+import numpy as np
 from constants import *
+from simulation import CircuitState
+from sprites import ScaledSpriteCache, RenderQueue, SpriteAtlas, sheet_frames
+from scenery import Scenery
+from road import RoadBatcher, BandedRasterizer
+from profiler import profiler, STAGE_ROAD, STAGE_SPRITES
 
-class Circuit:
-    def __init__(self):
-        # Road segments
-        self.segments = []
-        
-        # Segment length and road parameters
-        self.segment_length = SEGMENT_LENGTH
-        self.total_segments = None
-        self.visible_segments = VISIBLE_SEGMENTS
-        self.rumble_segments = RUMBLE_SEGMENTS
-        self.road_lanes = ROAD_LANES
-        self.road_width = ROAD_WIDTH
-        self.road_length = None
-        
-        # Obstacles (only cars)
-        self.obstacles = []
-        self.obstacle_density = 15  # Default, will be overridden by level
+# Circuit drawn in pseudo-3D (the road and car state is in CircuitState)
+class Circuit(CircuitState):
+    def __init__(self, assets):
+        super().__init__()
+        
+        # Shared asset cache
+        self.assets = assets
+        
+        # Segment colors, indexed by color_index
+        self.palette = [COLORS['LIGHT'], COLORS['DARK'], COLORS['START'], COLORS['FINISH']]
+        
+        # Size of the surface the road is drawn to (set by render_3d, smaller when rendering at reduced resolution)
+        self.view_width = SCREEN_WIDTH
+        self.view_height = SCREEN_HEIGHT
+        
+        # Screen projection of the visible window (filled each frame by project_segments)
+        self.screen_x = np.zeros(0, dtype=np.int32)
+        self.screen_y = np.zeros(0, dtype=np.int32)
+        self.screen_w = np.zeros(0, dtype=np.int32)
+        self.screen_scale = np.zeros(0, dtype=np.float64)
+        
+        # Sideways offset of each window point from the curves before it (world units), and the
+        # lowest screen row not yet covered by nearer road at each point
+        self.window_x = np.zeros(0, dtype=np.float64)
+        self.clip_y = np.zeros(0, dtype=np.int32)
+        
+        # Road drawing: merged strips ('batched'), one segment at a time ('segments') or the same
+        # pixels filled in bands ('banded')
+        self.road_renderer = ROAD_RENDERER
+        self.road_batcher = RoadBatcher(self.road_lanes)
+        self.road_rasterizer = None  # BandedRasterizer, with its thread pool, made on first use
+        
+        # Car images, keyed by object type
         self.obstacle_images = {}
         
         # Load obstacle images (only cars)
         self._load_obstacle_images()
+        
+        # Obstacle images pre-scaled to quantized distances
+        self.sprite_cache = ScaledSpriteCache(
+            self.obstacle_images,
+            levels=SPRITE_SCALE_LEVELS,
+            min_scale=SPRITE_MIN_SCALE,
+            smooth=SPRITE_SMOOTH_SCALE,
+            max_bytes=SPRITE_CACHE_BYTES
+        )
+        
+        # Roadside scenery, with every frame of its sprite sheets packed into one atlas: the
+        # sprite number of an object is the first frame of its type plus its frame
+        self.scenery = Scenery()
+        frames = []
+        self.scenery_first_frame = np.zeros(max(SCENERY_SHEETS) + 1, dtype=np.int64)
+        self.scenery_widths = np.zeros(max(SCENERY_SHEETS) + 1, dtype=np.float64)
+        for obj_type, (path, count) in SCENERY_SHEETS.items():
+            self.scenery_first_frame[obj_type] = len(frames)
+            self.scenery_widths[obj_type] = SCENERY_WIDTHS[obj_type]
+            frames += sheet_frames(self.assets.sprite(path), count)
+        self.scenery_atlas = SpriteAtlas(frames, SCENERY_ATLAS_WIDTH)
+        self.scenery_image_widths = np.array([region.get_width() for region in self.scenery_atlas.regions])
+        self.scenery_cache = ScaledSpriteCache(
+            self.scenery_atlas.regions,
+            levels=SPRITE_SCALE_LEVELS,
+            min_scale=SPRITE_MIN_SCALE,
+            smooth=SPRITE_SMOOTH_SCALE,
+            max_bytes=SPRITE_CACHE_BYTES
+        )
+        
+        # Sprites of the frame, drawn back to front after the road
+        self.render_queue = RenderQueue()
+    
+    def create(self, track_path=TRACK_PATH, endless=False):
+        """Loads the road and places the roadside scenery along it"""
+        super().create(track_path, endless)
+        self.scenery.place(self.total_segments, self.seed)
     
     def _load_obstacle_images(self):
         """Load obstacle images (only cars)"""
-        self.obstacle_images = {
-            OBJ_CAR: pygame.image.load("assets/img_car.png").convert_alpha(),
-            OBJ_TRUCK: pygame.image.load("assets/img_racing_car.png").convert_alpha()
-        }
+        self.obstacle_images = {key: self.assets.sprite(path) for key, path in OBSTACLE_IMAGES.items()}
     
-    def create(self):
-        """Creates the entire road environment"""
-        # Clear arrays
-        self.segments = []
+    def project_segments(self, camera, base_index):
+        """Projects the visible window of segments, starting at base_index, to screen space
         
-        # Create a road
-        self.create_road()
+        The whole window is projected in one vectorized pass; the results are stored in
+        screen_x, screen_y, screen_w and screen_scale (entry n is segment base_index + n).
+        Returns the segment numbers of the window.
+        """
+        index = (base_index + np.arange(self.visible_segments)) % self.total_segments
         
-        # Colorize first segments in starting color, and last segments in finishing color
-        for n in range(self.rumble_segments):
-            self.segments[n]['color']['road'] = (255, 255, 255)  # Start line
-            self.segments[-n-1]['color']['road'] = (34, 34, 34)  # Finish line
+        # Get the camera offset-Z to loop back the road
+        offset_z = np.where(index < base_index, self.road_length, 0)
         
-        # Store the total number of segments
-        self.total_segments = len(self.segments)
+        # Curves: each segment's bend adds to the sideways step of the next, and the steps add up
+        # to the offset of each point; only the window is accumulated, starting from the camera
+        curve = self.curve[index].astype(np.float64)
+        base_percent = (camera.z % self.segment_length) / self.segment_length
+        dx = np.cumsum(np.concatenate(([-curve[0] * base_percent], curve[:-1])))
+        self.window_x = np.concatenate(([0.0], np.cumsum(dx[:-1])))
         
-        # Calculate the road length
-        self.road_length = self.total_segments * self.segment_length
-    
-    def create_road(self):
-        """Creates the road sections"""
-        self.create_section(1000)  # Create a straight road with 1000 segments
-    
-    def create_section(self, n_segments):
-        """Creates a road section with the specified number of segments"""
-        for i in range(n_segments):
-            self.create_segment()
-    
-    def create_segment(self):
-        """Creates a new road segment"""
-        # Get the current number of segments
-        n = len(self.segments)
-        
-        # Add new segment
-        self.segments.append({
-            'index': n,
-            'point': {
-                'world': {'x': 0, 'y': 0, 'z': n * self.segment_length},
-                'screen': {'x': 0, 'y': 0, 'w': 0},
-                'scale': -1
-            },
-            # Alternately color the groups of segments dark and light
-            'color': COLORS['DARK'] if (n // self.rumble_segments) % 2 else COLORS['LIGHT']
-        })
-    
-    def create_obstacles(self):
-        """Create obstacles (cars) that are clearly visible"""
-        self.obstacles = []
-        
-        # Leave the first 20% of the track clear for the player
-        safe_zone = self.total_segments * 0.2
-        remaining_track = self.total_segments - safe_zone
-        
-        # Calculate number of cars based on density
-        num_cars = int(self.total_segments * (self.obstacle_density / 100))
-        
-        # Place cars at regular intervals with some randomness
-        for i in range(num_cars):
-            # Calculate a position that ensures cars are spread out
-            position_percent = (i / num_cars) * 0.8  # Use 80% of the remaining track
-            segment_index = int(safe_zone + (remaining_track * position_percent))
-            
-            # Add some randomness to the position
-            segment_index += random.randint(-5, 5)
-            
-            # Ensure segment_index is within valid range
-            segment_index = max(int(safe_zone), min(segment_index, self.total_segments - 1))
-            
-            # Determine car type (75% regular cars, 25% trucks)
-            obj_type = OBJ_CAR if random.random() > 0.25 else OBJ_TRUCK
-            
-            # Assign to a lane (-1: left, 0: center, 1: right)
-            lane = random.randint(-1, 1)
-            
-            # Set speed factor (50-80% of player's speed)
-            speed_factor = random.uniform(0.5, 0.8)
-            
-            # Add car
-            self.obstacles.append({
-                'z': segment_index * self.segment_length,
-                'type': obj_type,
-                'lane': lane,
-                'speed': speed_factor,
-                'active': True
-            })
+        # Translating world coordinates to camera coordinates
+        trans_x = self.window_x - camera.x
+        trans_y = self.world_y[index] - camera.y
+        trans_z = index * float(self.segment_length) - (camera.z - offset_z)
+        
+        self.screen_x, self.screen_y, self.screen_w, self.screen_scale = self.project_arrays(
+            trans_x, trans_y, trans_z, camera.dist_to_plane)
+        
+        return index
     
-    def update_obstacles(self, player_z, dt, player_speed):
-        """Update positions of all obstacles"""
-        player_segment = int(player_z / self.segment_length)
-        
-        for car in self.obstacles:
-            # Update car position based on its speed
-            car_speed = car['speed'] * player_speed
-            car['z'] += car_speed * dt
-            
-            # If car reaches end of track, loop it back
-            if car['z'] >= self.road_length:
-                car['z'] -= self.road_length
-            
-            # Check if this car should be reactivated (if it's far behind player)
-            car_segment = int(car['z'] / self.segment_length)
-            segment_diff = (car_segment - player_segment + self.total_segments) % self.total_segments
-            
-            # Mark cars as active if they are ahead of the player or close behind
-            car['active'] = (segment_diff < self.visible_segments) or (segment_diff > self.total_segments - 50)
+    def project_arrays(self, trans_x, trans_y, trans_z, camera_depth):
+        """Projects arrays of camera coordinates to screen x, y, road half-width and scale"""
+        # Scaling factor based on the law of similar triangles (avoid division by zero, and by
+        # distances so small that the projected points overflow)
+        scale = np.full(len(trans_z), 0.001)
+        np.divide(camera_depth, np.maximum(trans_z, NEAR_PLANE_Z), out=scale, where=trans_z > 0)
+        
+        # Projecting onto the normalized projection plane and scaling to the screen coordinates
+        center_x = self.view_width / 2
+        center_y = self.view_height / 2
+        screen_x = ((1 + scale * trans_x) * center_x).astype(np.int32)
+        screen_y = ((1 - scale * trans_y) * center_y).astype(np.int32)
+        screen_w = (scale * self.road_width * center_x).astype(np.int32)
+        
+        return screen_x, screen_y, screen_w, scale
     
-    def get_segment(self, position_z):
-        """Returns a segment at the given Z position"""
-        if position_z < 0:
-            position_z += self.road_length
-        index = int(position_z / self.segment_length) % self.total_segments
-        return self.segments[index]
+    def clip_segments(self):
+        """Returns the window positions of the projected segments above the clipping bottom line"""
+        # The clipping bottom line starts at the screen bottom and moves up with every nearer segment
+        # (the first segment of the window only provides the near edge of the second one)
+        ys = self.screen_y[1:]
+        clip_bottom_line = np.minimum.accumulate(np.concatenate(([self.view_height], ys[:-1])))
+        self.clip_y = np.concatenate(([self.view_height], clip_bottom_line)).astype(np.int32)
+        drawn = np.flatnonzero(ys < clip_bottom_line) + 1
+        
+        # Points hidden behind a hill are raised to the clipping line, so a segment that reappears
+        # beyond the crest does not reach down over the nearer road
+        hidden = (ys > clip_bottom_line) & (clip_bottom_line < self.view_height)
+        ys[hidden] = clip_bottom_line[hidden]
+        return drawn
     
-    def project_3d(self, point, camera_x, camera_y, camera_z, camera_depth):
-        """Projects a point from world coordinates to screen coordinates"""
-        # Translating world coordinates to camera coordinates
-        trans_x = point['world']['x'] - camera_x
-        trans_y = point['world']['y'] - camera_y
-        trans_z = point['world']['z'] - camera_z
+    def render_3d(self, screen, camera, obstacles=None):
+        """Renders the road and then the cars on it (obstacles, or a snapshot of them if given)"""
+        self.view_width, self.view_height = screen.get_size()
+        
+        # Get the base segment and project the whole view
+        base_index = self.get_segment_index(camera.z)
+        index = self.project_segments(camera, base_index)
+        
+        # Draw only the segments above the clipping bottom line
+        drawn = self.clip_segments()
+        colors = self.color_index[index]
         
-        # Scaling factor based on the law of similar triangles
-        if trans_z <= 0:
-            point['scale'] = 0.001  # Avoid division by zero
+        if self.road_renderer == 'segments':
+            self.render_segments(screen, drawn, colors)
+        elif self.road_renderer == 'banded':
+            self.render_banded(screen, drawn, colors)
         else:
-            point['scale'] = camera_depth / trans_z
+            self.road_batcher.draw(screen, self.screen_x, self.screen_y, self.screen_w, drawn, colors, self.palette)
         
-        # Projecting camera coordinates onto a normalized projection plane
-        projected_x = point['scale'] * trans_x
-        projected_y = point['scale'] * trans_y
-        projected_w = point['scale'] * self.road_width
+        # Seen from a hilltop the end of the view lies below the background's horizon, where the
+        # ground carries on in the farthest segment's grass color
+        top = min(int(self.clip_y[-1]), int(self.screen_y[-1]))
+        horizon = BACKGROUND_HORIZON * self.view_height // SCREEN_HEIGHT
+        if top > horizon:
+            screen.fill(self.palette[colors[-1]]['grass'], (0, horizon, self.view_width, top - horizon))
+        profiler.lap(STAGE_ROAD)
         
-        # Scaling projected coordinates to the screen coordinates
-        point['screen']['x'] = int((1 + projected_x) * SCREEN_CX)
-        point['screen']['y'] = int((1 - projected_y) * SCREEN_CY)
-        point['screen']['w'] = int(projected_w * SCREEN_CX)
+        # Render cars and scenery after the road, farthest first
+        self.render_obstacles(screen, camera, obstacles if obstacles is not None else self.obstacles)
+        self.render_scenery(camera, base_index)
+        self.render_queue.draw(screen)
+        profiler.lap(STAGE_SPRITES)
     
-    def render_3d(self, screen, camera):
-        """Renders the road by drawing segment by segment"""
-        # Define the clipping bottom line to render only segments above it
-        clip_bottom_line = SCREEN_HEIGHT
-        
-        # Get the base segment
-        base_segment = self.get_segment(camera.z)
-        base_index = base_segment['index']
-        
-        # Draw each segment in the view
-        for n in range(self.visible_segments):
-            # Get the current segment
-            curr_index = (base_index + n) % self.total_segments
-            curr_segment = self.segments[curr_index]
-            
-            # Get the camera offset-Z to loop back the road
-            offset_z = self.road_length if curr_index < base_index else 0
-            
-            # Project the segment to the screen space
-            self.project_3d(curr_segment['point'], camera.x, camera.y, camera.z - offset_z, camera.dist_to_plane)
-            
-            # Draw this segment only if it is above the clipping bottom line
-            curr_bottom_line = curr_segment['point']['screen']['y']
-            
-            if n > 0 and curr_bottom_line < clip_bottom_line:
-                prev_index = curr_index - 1 if curr_index > 0 else self.total_segments - 1
-                prev_segment = self.segments[prev_index]
-                
-                p1 = prev_segment['point']['screen']
-                p2 = curr_segment['point']['screen']
-                
-                # Draw the road segment
-                self.draw_segment(
-                    screen,
-                    p1['x'], p1['y'], p1['w'],
-                    p2['x'], p2['y'], p2['w'],
-                    curr_segment['color']
-                )
-                
-                # Move the clipping bottom line up
-                clip_bottom_line = curr_bottom_line
+    def render_segments(self, screen, drawn, colors):
+        """Draws the road segment by segment"""
+        # Plain lists are much faster than NumPy scalars in the drawing loop
+        xs = self.screen_x.tolist()
+        ys = self.screen_y.tolist()
+        ws = self.screen_w.tolist()
+        colors = colors.tolist()
         
-        # Render cars after the road
-        self.render_obstacles(screen, camera)
+        for n in drawn.tolist():
+            self.draw_segment(
+                screen,
+                xs[n - 1], ys[n - 1], ws[n - 1],
+                xs[n], ys[n], ws[n],
+                self.palette[colors[n]]
+            )
     
-    def render_obstacles(self, screen, camera):
-        """Render all cars on the road with simplified approach"""
-        # Get all segments the player can see
-        base_segment = self.get_segment(camera.z)
-        base_index = base_segment['index']
-        
-        # Draw active cars
-        for car in self.obstacles:
-            # Skip inactive cars
-            if not car['active']:
-                continue
-                
-            # Calculate relative position to camera
-            relative_z = car['z'] - camera.z
-            
-            # Handle looping around the track
-            if relative_z < 0:
-                relative_z += self.road_length
-            
-            # Skip if too far or behind camera
-            if relative_z <= 0 or relative_z > self.visible_segments * self.segment_length:
-                continue
-                
-            # Get the segment the car is on
-            car_segment = self.get_segment(car['z'])
-            car_segment_index = car_segment['index']
-            
-            # Calculate offset for looping
-            offset_z = self.road_length if car_segment_index < base_index else 0
-            
-            # Create a temporary point for the car's position
-            car_point = {
-                'world': {
-                    'x': car['lane'] * (self.road_width / 3),  # Distribute across lanes
-                    'y': 0,
-                    'z': car['z']
-                },
-                'screen': {'x': 0, 'y': 0, 'w': 0},
-                'scale': -1
-            }
-            
-            # Project the car's position
-            self.project_3d(car_point, camera.x, camera.y, camera.z - offset_z, camera.dist_to_plane)
+    def render_banded(self, screen, drawn, colors):
+        """Fills the road in bands with the banded rasterizer"""
+        # 24-bit surfaces have no pixel array view
+        if screen.get_bytesize() == 3:
+            self.render_segments(screen, drawn, colors)
+            return
+        
+        # The near edge of the window lies behind the camera and is not clipped, so nothing keeps the
+        # first segment from reaching down to or below it instead of stepping up the screen: such a
+        # segment is drawn on its own
+        if len(drawn) and self.screen_y[drawn[0]] >= self.screen_y[drawn[0] - 1]:
+            self.render_segments(screen, drawn[:1], colors)
+            drawn = drawn[1:]
+        
+        if self.road_rasterizer is None:
+            self.road_rasterizer = BandedRasterizer(self.road_lanes)
+        self.road_rasterizer.draw(screen, self.screen_x, self.screen_y, self.screen_w, drawn, colors, self.palette)
+    
+    def render_obstacles(self, screen, camera, cars):
+        """Queues the cars on the road for drawing"""
+        
+        # Get all segments the player can see, and the cars in them
+        base_index = self.get_segment_index(camera.z)
+        nearby = cars.in_segments(base_index - 1, self.visible_segments + 2)
+        
+        # Calculate relative position to camera (cars are drawn at their interpolated positions),
+        # handling looping around the track
+        relative_z = cars.render_z[nearby] - camera.z
+        relative_z += self.road_length * (relative_z < 0)
+        
+        # Keep active cars that are in front of the camera and not too far, farthest segments first
+        # (the index lists cars by segment, so they come almost in drawing order)
+        visible = cars.active[nearby] & (relative_z > 0) & (relative_z <= self.visible_segments * self.segment_length)
+        selected = nearby[visible][::-1]
+        if len(selected) == 0:
+            return
+        
+        # Calculate offset for looping
+        car_z = cars.render_z[selected]
+        car_segment_index = (car_z / self.segment_length).astype(np.int64) % self.total_segments
+        offset_z = np.where(car_segment_index < base_index, self.road_length, 0)
+        
+        # Follow the road's curves and hills between the two points of each car's segment
+        n = np.minimum((car_segment_index - base_index) % self.total_segments, len(self.window_x) - 2)
+        percent = car_z / self.segment_length % 1
+        road_x = self.window_x[n] + (self.window_x[n + 1] - self.window_x[n]) * percent
+        y1 = self.world_y[car_segment_index]
+        y2 = self.world_y[(car_segment_index + 1) % self.total_segments]
+        road_y = y1 + (y2 - y1) * percent
+        
+        # Project the cars' positions (at their interpolated places across the road)
+        depth = car_z - (camera.z - offset_z)
+        screen_x, screen_y, screen_w, _ = self.project_arrays(
+            cars.render_x[selected] * self.road_width + road_x - camera.x,
+            road_y - camera.y,
+            depth,
+            camera.dist_to_plane
+        )
+        
+        # Cars are cut off where nearer road (a hill crest) covers them
+        clip_y = self.clip_y[n + 1].tolist()
+        
+        # Queue the cars at their projected positions
+        car_types = cars.type[selected].tolist()
+        queue = self.render_queue
+        for car_type, x, y, w, z, clip in zip(car_types, screen_x.tolist(), screen_y.tolist(), screen_w.tolist(),
+                                              depth.tolist(), clip_y):
+            # Calculate size based on the projected road width
+            car_image = self.obstacle_images[car_type]
+            scale = min(1.0, w * CAR_WIDTH / car_image.get_width())  # Limit maximum size
             
-            # Only render if point has valid scale
-            if car_point['scale'] <= 0:
-                continue
+            if scale > SPRITE_MIN_SCALE:  # Only draw if not too small
+                # Image pre-scaled to the nearest cached level
+                scaled_car = self.sprite_cache.get(car_type, scale)
+                car_width, car_height = scaled_car.get_size()
                 
-            # Draw the car at the projected position
-            car_image = self.obstacle_images[car['type']]
-            
-            # Calculate size based on distance (scale)
-            scale = min(1.0, car_point['scale'] * 0.8)  # Limit maximum size
-            
-            if scale > 0.1:  # Only draw if not too small
-                car_width = int(car_image.get_width() * scale)
-                car_height = int(car_image.get_height() * scale)
+                # Car at projected position
+                car_x = x - car_width // 2
+                car_y = y - car_height
                 
-                # Only draw if dimensions are valid
-                if car_width > 1 and car_height > 1:
-                    # Scale image
-                    try:
-                        scaled_car = pygame.transform.scale(car_image, (car_width, car_height))
-                        
-                        # Draw car at projected position
-                        car_x = car_point['screen']['x'] - car_width // 2
-                        car_y = car_point['screen']['y'] - car_height
-                        
-                        # Make sure car is in visible area
-                        if 0 <= car_x < SCREEN_WIDTH and 0 <= car_y < SCREEN_HEIGHT:
-                            screen.blit(scaled_car, (car_x, car_y))
-                    except pygame.error:
-                        # Skip if scaling fails
-                        pass
+                # Make sure car is in visible area
+                if 0 <= car_x < self.view_width and 0 <= car_y < self.view_height:
+                    if car_y + car_height <= clip:
+                        queue.add(scaled_car, car_x, car_y, z)
+                    elif car_y < clip:
+                        queue.add(scaled_car, car_x, car_y, z, clip - car_y)
+    
+    def render_scenery(self, camera, base_index):
+        """Queues the roadside scenery of the visible window for drawing"""
+        scenery = self.scenery
+        items = scenery.in_segments(base_index + 1, self.visible_segments - 2)
+        if len(items) == 0:
+            return
+        segment = scenery.segment[items]
+        obj_type = scenery.type[items]
+        frame = scenery.frame[items]
+        offset = scenery.offset[items]
+        
+        # Curve signs show only on bends, on the outside, pointing into the bend (the first frame
+        # points right)
+        curve = self.curve[segment]
+        sign = obj_type == OBJ_SIGN
+        frame = np.where(sign, curve < 0, frame)
+        offset = np.where(sign & (curve > 0), -offset, offset)
+        
+        # Project the objects, standing at the near edge of their segments
+        n = (segment - base_index) % self.total_segments
+        offset_z = np.where(segment < base_index, self.road_length, 0)
+        depth = segment * float(self.segment_length) - (camera.z - offset_z)
+        screen_x, screen_y, screen_w, _ = self.project_arrays(
+            offset * self.road_width + self.window_x[n] - camera.x,
+            self.world_y[segment] - camera.y,
+            depth,
+            camera.dist_to_plane
+        )
+        
+        # Keep the objects that are large enough to see and at least partly on screen
+        sprite = self.scenery_first_frame[obj_type] + frame
+        width = screen_w * self.scenery_widths[obj_type]
+        scale = np.minimum(1.0, width / self.scenery_image_widths[sprite])
+        shown = ((~sign | (curve != 0)) & (scale > SPRITE_MIN_SCALE)
+                 & (screen_x + width > 0) & (screen_x - width < self.view_width))
+        if not shown.any():
+            return
+        
+        # Cut off where nearer road covers them, like the cars
+        clip_y = self.clip_y[n[shown] + 1].tolist()
+        levels = self.scenery_cache.quantize_array(scale[shown]).tolist()
+        
+        # Queue the scaled sprites
+        queue = self.render_queue
+        get_level = self.scenery_cache.get_level
+        for key, level, x, y, z, clip in zip(sprite[shown].tolist(), levels, screen_x[shown].tolist(),
+                                             screen_y[shown].tolist(), depth[shown].tolist(), clip_y):
+            image = get_level(key, level)
+            image_width, image_height = image.get_size()
+            left = x - image_width // 2
+            top = y - image_height
+            if top + image_height <= clip:
+                queue.add(image, left, top, z)
+            elif top < clip:
+                queue.add(image, left, top, z, clip - top)
     
     def draw_segment(self, screen, x1, y1, w1, x2, y2, w2, color):
         """Draws a road segment"""
         # Draw grass
-        pygame.draw.rect(screen, color['grass'], (0, y2, SCREEN_WIDTH, y1 - y2))
+        pygame.draw.rect(screen, color['grass'], (0, y2, self.view_width, y1 - y2))
         
         # Draw road
         self.draw_polygon(screen, [
@@ -0,0 +1,102 @@
+import pygame
+from constants import (SCREEN_WIDTH, SCREEN_HEIGHT, CAR_WIDTH, PLAYER_IMAGE, OBSTACLE_IMAGES, SPRITE_SCALE_LEVELS,
+                       SPRITE_MIN_SCALE, MASK_BACKGROUND_THRESHOLD)
+from sprites import ScaledSpriteCache
+from camera import Camera
+
+def sprite_mask(image):
+    """Returns the collision mask of a sprite
+
+    Sprites with transparent pixels use their opaque pixels. Fully opaque images (the car photos)
+    use the largest connected area that differs from the background color, sampled at the top
+    center.
+    """
+    width, height = image.get_size()
+    mask = pygame.mask.from_surface(image)
+    if mask.count() < width * height:
+        return mask
+    background = image.get_at((width // 2, min(3, height - 1)))
+    threshold = (MASK_BACKGROUND_THRESHOLD,) * 3 + (255,)
+    mask = pygame.mask.from_threshold(image, background, threshold)
+    mask.invert()
+    return max(mask.connected_components(), key=lambda component: component.count(), default=mask)
+
+# Pixel-accurate narrow phase of the player's collision check
+#
+# The broad phase (PlayerState.check_collision) finds the cars that overlap the player's car in z
+# and across the road. Each is then placed where the game draws it at full screen resolution,
+# and it is a hit when its sprite mask overlaps the player's. Car masks are built once per
+# quantized scale (the levels the drawn sprites use) and kept, so a warmed-up check allocates
+# nothing. Only the camera's fixed geometry is used: results never depend on rendering.
+class MaskCollider:
+    def __init__(self, camera, player_image, obstacle_images):
+        self.camera = camera
+
+        # Player's mask, at the position the player's car is drawn
+        self.player_mask = sprite_mask(player_image)
+        width, height = player_image.get_size()
+        self.player_x = SCREEN_WIDTH // 2 - width // 2
+        self.player_y = SCREEN_HEIGHT - height // 2 - height
+
+        # Full-size car masks and image widths, keyed by object type
+        self.source_masks = {key: sprite_mask(image) for key, image in obstacle_images.items()}
+        self.widths = {key: image.get_width() for key, image in obstacle_images.items()}
+
+        # Scale quantization shared with the drawn sprites (no scaled surfaces are ever built)
+        self.scales = ScaledSpriteCache(obstacle_images, levels=SPRITE_SCALE_LEVELS, min_scale=SPRITE_MIN_SCALE)
+
+        # Scaled car masks, keyed by (object type, level)
+        self.masks = {}
+
+    @classmethod
+    def load(cls, camera=None, player_path=PLAYER_IMAGE, obstacle_paths=OBSTACLE_IMAGES):
+        """Builds a collider from the image files, for the default camera if none is given (works without a display)"""
+        if camera is None:
+            camera = Camera()
+            camera.init()
+        obstacle_images = {key: pygame.image.load(path) for key, path in obstacle_paths.items()}
+        return cls(camera, pygame.image.load(player_path), obstacle_images)
+
+    def mask(self, key, scale):
+        """Returns a car's mask scaled to the level closest to scale"""
+        level = self.scales.quantize(scale)
+        mask = self.masks.get((key, level))
+        if mask is None:
+            source = self.source_masks[key]
+            level_scale = self.scales.level_scale(level)
+            width, height = source.get_size()
+            mask = source.scale((max(1, int(width * level_scale)), max(1, int(height * level_scale))))
+            self.masks[(key, level)] = mask
+        return mask
+
+    def collide(self, player, circuit, dz, dx, types):
+        """Returns whether any candidate car overlaps the player's car on screen
+
+        dz and dx are the cars' offsets from the player along the road (world units) and across
+        it (normalized like player.x), types their object types.
+        """
+        camera = self.camera
+        center_x = SCREEN_WIDTH / 2
+        center_y = SCREEN_HEIGHT / 2
+        camera_y = camera.height + circuit.height_at(player.z)
+
+        for z, x, key in zip(dz.tolist(), dx.tolist(), types.tolist()):
+            # Project the car as render_obstacles does, with the camera behind the player
+            trans_z = z + camera.dist_to_player
+            if trans_z <= 0:
+                continue
+            scale = camera.dist_to_plane / trans_z
+            trans_y = circuit.height_at((player.z + z) % circuit.road_length) - camera_y
+            screen_x = int((1 + scale * x * circuit.road_width) * center_x)
+            screen_y = int((1 - scale * trans_y) * center_y)
+            road_w = int(scale * circuit.road_width * center_x)
+
+            sprite_scale = min(1.0, road_w * CAR_WIDTH / self.widths[key])
+            if sprite_scale <= SPRITE_MIN_SCALE:
+                continue
+            mask = self.mask(key, sprite_scale)
+            width, height = mask.get_size()
+            offset = (screen_x - width // 2 - self.player_x, screen_y - height - self.player_y)
+            if self.player_mask.overlap(mask, offset) is not None:
+                return True
+        return False
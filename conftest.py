@@ -0,0 +1,20 @@
+import os
+import pytest
+
+# Tracks and assets are loaded by paths relative to the repository
+@pytest.fixture(autouse=True)
+def repository_directory(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='session')
+def assets():
+    """Opens a display on the dummy video driver and returns an asset cache converted for it"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    import pygame
+    from assets import AssetManager
+
+    pygame.init()
+    pygame.display.set_mode((480, 270))
+    yield AssetManager()
+    pygame.quit()
@@ -16,9 +16,17 @@ STATE_PAUSED = 6
 # Colors
 COLORS = {
     'LIGHT': {'road': (136, 136, 136), 'grass': (66, 147, 82), 'rumble': (184, 49, 46)},
-    'DARK': {'road': (102, 102, 102), 'grass': (57, 125, 70), 'rumble': (221, 221, 221), 'lane': (255, 255, 255)}
+    'DARK': {'road': (102, 102, 102), 'grass': (57, 125, 70), 'rumble': (221, 221, 221), 'lane': (255, 255, 255)},
+    'START': {'road': (255, 255, 255), 'grass': (66, 147, 82), 'rumble': (184, 49, 46)},
+    'FINISH': {'road': (34, 34, 34), 'grass': (57, 125, 70), 'rumble': (221, 221, 221), 'lane': (255, 255, 255)}
 }
 
+# Segment color indices (into Circuit.palette)
+COLOR_LIGHT = 0
+COLOR_DARK = 1
+COLOR_START = 2
+COLOR_FINISH = 3
+
 # Road parameters
 SEGMENT_LENGTH = 100
 ROAD_WIDTH = 1000
@@ -26,9 +34,161 @@ RUMBLE_SEGMENTS = 5
 ROAD_LANES = 3
 VISIBLE_SEGMENTS = 200
 
+# Nearest distance in front of the camera that is projected (nearer points are projected at it, so
+# their screen coordinates stay within integer range)
+NEAR_PLANE_Z = 1
+
+# Track loaded by Circuit.create (a description is compiled to a .trk file next to it on first use)
+TRACK_PATH = "tracks/default.json"
+
+# Endless mode: segments kept behind the player in the streamed ring (it holds the view plus twice
+# this), and how far the generated road may climb or dip from its starting height
+TRACK_STREAM_MARGIN = 60
+ENDLESS_MAX_HEIGHT = 6000
+
+# Simulation runs in fixed steps, independent of the frame rate
+SIM_HZ = 120
+SIM_DT = 1 / SIM_HZ
+MAX_SIM_STEPS = 12  # Per rendered frame, so a long stall does not snowball
+
+# Seconds of play needed to win
+WIN_TIME = 90
+
+# Bot drivers: segments ahead they watch for cars, and simulation steps between decisions
+BOT_LOOKAHEAD = 40
+BOT_REACTION = 6
+
+# World units in a kilometer (a segment is a meter), for per-kilometer statistics
+WORLD_UNITS_PER_KM = 100 * 1000
+
+# Background layers
+# The road covers the screen below the horizon line, so moving layers are cut off there
+BACKGROUND_HORIZON = SCREEN_CY + 20
+
+# Static layers (image, top y), composited once into one opaque surface
+BACKGROUND_STATIC_LAYERS = [
+    ("assets/img_back.png", 0),
+    ("assets/img_sky.png", 0)
+]
+
+# Moving layers from far to near (image, height on screen, top y, pixels scrolled per unit of camera x,
+# transparent spacing between tiles)
+BACKGROUND_MOVING_LAYERS = [
+    ("assets/img_hills.png", 360, 200, 0.05, 0),
+    ("assets/img_city.png", 720, SCREEN_HEIGHT - 720, 0.15, 0),
+    ("assets/img_trees.png", 60, BACKGROUND_HORIZON - 60, 0.3, 260)
+]
+
+# Maximum number of rendered text surfaces kept by Settings
+TEXT_CACHE_SIZE = 64
+
+# Push only changed rectangles to the display on static screens (menu, countdown, frozen frames)
+DIRTY_RECT_UPDATES = True
+
+# Frame profiler: frames kept, graph height in pixels and the milliseconds it spans
+PROFILE_FRAMES = 240
+PROFILE_GRAPH_HEIGHT = 120
+PROFILE_GRAPH_MS = 20
+
+# Road level of detail (batched renderer): lane lines and rumble strips are drawn up to these
+# distances in segments; beyond the rumble distance, color bands thinner than the merge height
+# in pixels are merged into single spans
+ROAD_LOD_LANES = 60
+ROAD_LOD_RUMBLE = 120
+ROAD_LOD_MERGE_HEIGHT = 2
+
+# Adaptive quality: levels from cheapest to best as (render scale, view distance factor, smooth
+# sprite scaling, moving background layers). The render scale is the fraction of the screen
+# resolution the background, road and cars are drawn at before being scaled up.
+QUALITY_LEVELS = [
+    (0.5, 0.5, False, False),
+    (0.5, 0.75, False, True),
+    (1.0, 0.75, False, True),
+    (1.0, 1.0, False, True),
+    (1.0, 1.0, True, True)
+]
+
+# Quality governor: frame time budget in milliseconds, frames averaged per decision, fractions of
+# the budget above which quality drops and below which it rises, and frames to wait after a change
+QUALITY_BUDGET_MS = 1000 / 60
+QUALITY_WINDOW = 30
+QUALITY_DROP = 0.95
+QUALITY_RAISE = 0.6
+QUALITY_COOLDOWN = 90
+
+# Road drawing: 'batched' merges segments into strips (with level of detail), 'segments' draws them one by one at full detail,
+# 'banded' fills the same pixels as 'segments' straight into the screen, in ROAD_BANDS bands on a thread pool
+ROAD_RENDERER = 'batched'
+ROAD_BANDS = 4
+
 # Object types
 OBJ_CAR = 0
 OBJ_TRUCK = 1
 OBJ_BILLBOARD = 2
 OBJ_TREE = 3
-OBJ_SIGN = 4
\ No newline at end of file
+OBJ_SIGN = 4
+
+# Sprite images
+PLAYER_IMAGE = "assets/img_player.png"
+OBSTACLE_IMAGES = {
+    OBJ_CAR: "assets/img_car.png",
+    OBJ_TRUCK: "assets/img_racing_car.png"
+}
+
+# Roadside scenery sprite sheets (path, frames side by side) and sprite widths relative to the
+# projected road half-width, keyed by object type
+SCENERY_SHEETS = {
+    OBJ_TREE: ("assets/img_trees.png", 2),
+    OBJ_BILLBOARD: ("assets/img_billboards.png", 2),
+    OBJ_SIGN: ("assets/img_signs.png", 2)
+}
+SCENERY_WIDTHS = {
+    OBJ_TREE: 0.8,
+    OBJ_BILLBOARD: 1.0,
+    OBJ_SIGN: 0.3
+}
+
+# Scenery placement: chance of a tree on each side of a segment and the range of their distances
+# from the road center (in road half-widths), segments between billboards and their distance, and
+# segments between curve sign slots and their distance (signs only show where the road bends)
+SCENERY_TREE_CHANCE = 0.25
+SCENERY_TREE_OFFSETS = (2.2, 5.0)
+SCENERY_BILLBOARD_SPACING = 60
+SCENERY_BILLBOARD_OFFSET = 1.7
+SCENERY_SIGN_SPACING = 8
+SCENERY_SIGN_OFFSET = 1.35
+
+# Width of the scenery sprite atlas (sprites are packed in rows up to this width)
+SCENERY_ATLAS_WIDTH = 2048
+
+# Car sprite width relative to the projected road half-width (about the player's car)
+CAR_WIDTH = 0.26
+
+# Lane centers across the road (lanes -1, 0 and 1), as a fraction of the road half-width
+LANE_OFFSET = 2 / 3
+
+# Collision: length of a car along the road in world units (cars closer than this in z can
+# touch), and how far a sprite pixel's color may be from the background color and still count
+# as background in collision masks of opaque sprites
+CAR_LENGTH = 200
+MASK_BACKGROUND_THRESHOLD = 40
+
+# Traffic car-following (Intelligent Driver Model): gap kept between bumpers when stopped (world
+# units), seconds of headway kept at speed, and acceleration and comfortable braking as fractions
+# of the player's top speed per second
+TRAFFIC_MIN_GAP = 100
+TRAFFIC_HEADWAY = 0.5
+TRAFFIC_ACCELERATION = 0.2
+TRAFFIC_BRAKING = 0.6
+
+# Traffic lane changes: chance per second that a held-up car (below this fraction of its desired
+# speed) tries one, and seconds it takes to move over
+TRAFFIC_LANE_CHANGE_RATE = 0.5
+TRAFFIC_HELD_UP = 0.9
+TRAFFIC_LANE_CHANGE_TIME = 1.0
+
+# Scaled sprite cache
+SPRITE_SCALE_LEVELS = 128
+SPRITE_MIN_SCALE = 0.01
+SPRITE_CACHE_BYTES = 64 * 1024 * 1024
+SPRITE_SMOOTH_SCALE = False
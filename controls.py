@@ -0,0 +1,18 @@
+import pygame
+from simulation import InputProvider
+
+# Keys that drive the car, in input bit order (bit 0 = up, see simulation.INPUT_UP and on)
+INPUT_KEYS = (pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT)
+
+def encode_keys(keys):
+    """Packs the driving keys of a key state into a bit mask"""
+    mask = 0
+    for bit, key in enumerate(INPUT_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+class KeyboardInput(InputProvider):
+    """Reads the driving keys from the keyboard"""
+    def next(self):
+        return encode_keys(pygame.key.get_pressed())
@@ -0,0 +1,36 @@
+import pygame
+
+# Dirty-rectangle display updates
+#
+# Screens that barely change register the rectangles they draw and are pushed to the display
+# with pygame.display.update(rects). A frame whose whole view moved calls invalidate() and is
+# flipped as usual. Rectangles drawn in the previous update are pushed again, so anything erased
+# since then reaches the display too.
+class DirtyRects:
+    def __init__(self, enabled=True):
+        # When disabled every flush is a full flip
+        self.enabled = enabled
+
+        # Rectangles changed since the last flush, and the ones pushed by it
+        self.rects = []
+        self.previous = []
+        self.full = False
+
+    def add(self, rect):
+        """Registers a changed rectangle"""
+        self.rects.append(pygame.Rect(rect))
+
+    def invalidate(self):
+        """Marks the whole screen as changed"""
+        self.full = True
+
+    def flush(self):
+        """Pushes the changed parts of the screen to the display"""
+        if self.full or not self.enabled:
+            pygame.display.flip()
+        elif self.rects or self.previous:
+            pygame.display.update(self.rects + self.previous)
+
+        self.previous = self.rects
+        self.rects = []
+        self.full = False
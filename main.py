@@ -1,30 +1,34 @@
 import pygame
+import argparse
+import logging
 import sys
-from constants import SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_CX, SCREEN_CY
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_CX, SCREEN_CY, DIRTY_RECT_UPDATES, SIM_DT, QUALITY_LEVELS
+from assets import AssetManager
+from background import Background
+from dirty import DirtyRects
 from circuit import Circuit
 from camera import Camera
 from player import Player
 from settings import Settings
+from timestep import FixedTimestep
+from controls import KeyboardInput
+from simulation import LEVELS, Simulation, setup_simulation
+from pipeline import SimulationPipeline
+from collision import MaskCollider
+from replay import InputRecorder
+from profiler import (profiler, STAGE_EVENTS, STAGE_CAMERA, STAGE_WAIT, STAGE_BACKGROUND, STAGE_SPRITES, STAGE_SCALE,
+                      STAGE_HUD, STAGE_FLIP)
+from quality import QualityGovernor
 
-# Level definitions
-class Level:
-    def __init__(self, name, speed, obstacle_density):
-        self.name = name
-        self.speed = speed
-        self.obstacle_density = obstacle_density
-
-LEVELS = {
-    'easy': Level('Easy', 500, 10),
-    'medium': Level('Medium', 1000, 20),
-    'hard': Level('Hard', 1500, 30)
-}
+logger = logging.getLogger(__name__)
 
 def countdown(screen, settings):
     """Display a 3, 2, 1 countdown before the game starts."""
+    screen.fill((0, 0, 0))
+    settings.dirty.invalidate()
     for i in range(3, 0, -1):
-        screen.fill((0, 0, 0))
         settings.show_countdown(i)
-        pygame.display.flip()
+        settings.dirty.flush()
         pygame.time.wait(1000)
 
 def select_level(screen, settings):
@@ -32,114 +36,247 @@ def select_level(screen, settings):
     options = ["Easy", "Medium", "Hard"]
     selected = 0
 
+    # Draw the whole menu once, afterwards only the entries that change
+    settings.show_level_selection(options, selected)
+    settings.dirty.flush()
+
     while True:
-        screen.fill((0, 0, 0))
-        settings.show_level_selection(options, selected)
-        pygame.display.flip()
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+        if event.type == pygame.KEYDOWN:
+            previous = selected
+            if event.key == pygame.K_UP:
+                selected = (selected - 1) % len(options)
+            if event.key == pygame.K_DOWN:
+                selected = (selected + 1) % len(options)
+            if event.key == pygame.K_RETURN:
+                return options[selected].lower()
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP:
-                    selected = (selected - 1) % len(options)
-                if event.key == pygame.K_DOWN:
-                    selected = (selected + 1) % len(options)
-                if event.key == pygame.K_RETURN:
-                    return options[selected].lower()
+            if selected != previous:
+                settings.show_level_option(options, previous, selected)
+                settings.show_level_option(options, selected, selected)
+                settings.dirty.flush()
+
+def setup_game(assets, level, seed=None, endless=False):
+    """Create and initialize the circuit, camera and player for a level (seed fixes the obstacles and endless road)."""
+    circuit = Circuit(assets)
+    camera = Camera()
+    player = Player(assets)
+
+    # Initialize game
+    camera.init()
+    player.init()
+    setup_simulation(circuit, player, level, seed, endless)
+
+    # Pixel-accurate collisions against the sprites as drawn
+    player.collider = MaskCollider(camera, player.sprite_img, circuit.obstacle_images)
+
+    return circuit, camera, player
+
+def update_view(alpha, circuit, camera, player):
+    """Place the player, obstacles and camera a fraction alpha between the last two simulation steps."""
+    player_x, player_z = player.interpolate(alpha, circuit.road_length)
+    circuit.obstacles.interpolate(alpha)
+    camera.follow(player_x, player_z, circuit)
+    profiler.lap(STAGE_CAMERA)
+
+def simulate(simulation, steps, driver=None):
+    """Run simulation steps as fast as possible, without rendering, playing on after a collision or the win. Returns the number of collisions."""
+    collisions = 0
+    for _ in range(steps):
+        mask = driver.next() if driver is not None else 0
+        if simulation.step(mask):
+            collisions += 1
+    return collisions
+
+def render_scene(screen, background, circuit, camera, player, frame=None, obstacles=None):
+    """Draw the background, road, obstacles and player car (the 3D view into frame and scaled up, if given).
+
+    The cars are drawn from obstacles if given (a snapshot taken for the pipelined loop).
+    """
+    view = frame if frame is not None else screen
+
+    # Draw the background layers (they cover the whole view)
+    background.render(view, camera.x)
+    profiler.lap(STAGE_BACKGROUND)
+
+    # Draw road and obstacles
+    circuit.render_3d(view, camera, obstacles)
+
+    # Scale a reduced-resolution view up to the screen
+    if frame is not None:
+        pygame.transform.scale(frame, screen.get_size(), screen)
+        profiler.lap(STAGE_SCALE)
+
+    # Draw player car (always at full resolution)
+    player.render(screen)
+    profiler.lap(STAGE_SPRITES)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pseudo-3D Racer")
+    parser.add_argument('--seed', type=int, help="obstacle placement seed (random by default)")
+    parser.add_argument('--record', metavar='PATH', help="record the run's seed, level and input for replay.py")
+    parser.add_argument('--endless', action='store_true', help="drive an endless road generated from the seed")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="time every frame stage and export the last frames to CSV (or JSON for .json) on exit")
+    parser.add_argument('--quality', type=int, choices=range(len(QUALITY_LEVELS)), metavar='LEVEL',
+                        help=f"pin the rendering quality level (0-{len(QUALITY_LEVELS) - 1}, adaptive by default)")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="run the simulation on a second thread, one frame ahead of drawing")
+    parser.add_argument('--verbose', action='store_true',
+                        help="log quality changes, and the asset, sprite cache and quality summaries on exit")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+
+    # Logs are shown when asked for, or while profiling
+    logging.basicConfig(level=logging.INFO if args.verbose or args.profile else logging.WARNING, format='%(message)s')
+
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Pseudo-3D Racer")
     clock = pygame.time.Clock()
 
-    # Initialize settings
-    settings = Settings(screen)
+    # Shared asset cache (needs the display mode to convert surfaces)
+    assets = AssetManager()
+    background = Background(assets)
+
+    # Initialize settings, drawing through the dirty-rectangle tracker
+    dirty = DirtyRects(DIRTY_RECT_UPDATES)
+    settings = Settings(screen, dirty)
 
     # Level selection
     selected_level = select_level(screen, settings)
     level = LEVELS[selected_level]
 
     # Initialize game objects
-    circuit = Circuit()
-    camera = Camera()
-    player = Player()
-    
-    # Adjust player speed based on the selected level
-    player.max_speed = level.speed
-    circuit.obstacle_density = level.obstacle_density
+    circuit, camera, player = setup_game(assets, level, args.seed, args.endless)
 
-    # Initialize game
-    camera.init()
-    player.init()
-    circuit.create()  # Create the road first
-    circuit.create_obstacles()  # Then create obstacles
+    # Driving input, read once per frame
+    keyboard = KeyboardInput()
+
+    # Record the input of every simulation tick
+    recorder = InputRecorder(circuit.seed, selected_level, args.endless) if args.record else None
+
+    # Rendering quality, adapted to the frame time unless pinned on the command line
+    quality = QualityGovernor(level=args.quality, pinned=args.quality is not None)
+    quality.apply(circuit, background, level)
 
-    # Countdown before starting
+    # Per-stage frame timing (F3 shows the graph and starts timing)
+    if args.profile:
+        profiler.enable()
+
+    # Countdown before starting (and don't count it as frame time)
     countdown(screen, settings)
+    clock.tick()
 
     # Game state
     paused = False
     game_over = False
     won = False
-    start_time = pygame.time.get_ticks()
+
+    # Fixed-step simulation clock and simulated play time
+    timestep = FixedTimestep()
+    ticks = 0
+
+    # Pipelined mode: the simulation steps on a worker thread while the main thread draws the
+    # previous state, placed at view_alpha between its last two steps (and its parts are not timed,
+    # as the profiler belongs to the main thread)
+    simulation = Simulation(circuit, player, lap=None if args.pipelined else profiler.lap_stage)
+    pipeline = SimulationPipeline(simulation, recorder) if args.pipelined else None
+    view_alpha = 0.0
+
+    # Copy of the last 3D frame while the view is frozen (paused, game over or won)
+    frozen_frame = None
 
     # Main game loop
     while True:
         dt = clock.tick(60) / 1000  # Amount of seconds between each loop
+        profiler.begin_frame()
+
+        # Take the simulation state back from the worker thread
+        if pipeline is not None:
+            pipeline.wait()
+            profiler.lap(STAGE_WAIT)
+
+        # Step the rendering quality towards the frame time budget
+        if quality.update(clock.get_rawtime()):
+            quality.apply(circuit, background, level)
 
         # Handle events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if pipeline is not None:
+                    pipeline.close()
+                if recorder is not None:
+                    recorder.save(args.record)
+                    logger.info("recorded %d ticks to %s", recorder.ticks(), args.record)
+                if args.profile:
+                    profiler.export(args.profile)
+                    logger.info("exported %d profiled frames to %s", len(profiler.frames()), args.profile)
+                logger.info(assets.summary())
+                logger.info(circuit.sprite_cache.summary())
+                logger.info("quality: level %d (%s)", quality.level, quality.describe())
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
                     paused = not paused
+                if event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+        profiler.lap(STAGE_EVENTS)
 
-        # Update game logic
-        if not paused and not game_over and not won:
-            player.update(dt, circuit)
-            camera.update(player, circuit)
-            
-            # Update obstacles
-            circuit.update_obstacles(player.z, dt, player.max_speed)
-
-            # Increment score based on distance traveled
-            settings.score = int(player.z / 100)
-
-            # Check for collisions
-            if player.check_collision(circuit):
-                game_over = True
-                settings.time = (pygame.time.get_ticks() - start_time) // 1000  # Stop the timer
+        if pipeline is not None:
+            # Take over the outcome of the steps the worker ran during the last frame, place the
+            # view and copy the cars to draw, then hand the worker this frame's steps
+            ticks = simulation.ticks
+            game_over, won = simulation.collided, simulation.won
+            settings.score = int(player.distance / 100)
+            update_view(view_alpha, circuit, camera, player)
+            obstacles = circuit.obstacles.snapshot()
+            if not paused and not game_over and not won:
+                pipeline.start([keyboard.next()] * timestep.advance(dt))
+                view_alpha = timestep.alpha()
+        else:
+            # Update game logic in fixed simulation steps
+            if not paused and not game_over and not won:
+                mask = keyboard.next()
+                for _ in range(timestep.advance(dt)):
+                    if recorder is not None:
+                        recorder.record(mask)
+                    simulation.step(mask)
 
-            # Check if the player has crossed the finishing line
-            elapsed_time = (pygame.time.get_ticks() - start_time) / 1000
-            if elapsed_time >= 90:  # 1 minute and 30 seconds
-                won = True
+                    # Stop on a collision or at the finishing time (the timer stops with the simulation)
+                    if simulation.finished():
+                        break
 
-        # Render the game
-        screen.fill((0, 0, 0))
+                ticks = simulation.ticks
+                game_over, won = simulation.collided, simulation.won
 
-        # Draw sky background
-        sky_image = pygame.image.load("assets/img_sky.png")
-        screen.blit(sky_image, (0, 0))
+                # Increment score based on distance traveled
+                settings.score = int(player.distance / 100)
 
-        # Draw city background
-        city_image = pygame.image.load("assets/img_city.png")
-        screen.blit(city_image, (0, SCREEN_HEIGHT - city_image.get_height()))
+            # Move the view between the last two simulation states
+            update_view(timestep.alpha(), circuit, camera, player)
+            obstacles = None
 
-        # Draw road and obstacles
-        circuit.render_3d(screen, camera)
-
-        # Draw player car
-        player.render(screen)
+        # Render the game, or only restore the HUD area while the view is frozen
+        frozen = paused or game_over or won
+        if frozen and frozen_frame is not None:
+            for rect in dirty.previous:
+                screen.blit(frozen_frame, rect, rect)
+        else:
+            render_scene(screen, background, circuit, camera, player, quality.frame(), obstacles)
+            dirty.invalidate()
+            frozen_frame = screen.copy() if frozen else None
 
         # Draw score and time
-        settings.update_time(start_time)
+        settings.update_time(ticks * SIM_DT)
         settings.show_score()
+        settings.show_quality(quality.level, quality.describe())
 
         # Show game over or win message
         if game_over:
@@ -151,8 +288,15 @@ def main():
         if paused:
             settings.show_pause()
 
-        # Update the display
-        pygame.display.flip()
+        # Show the frame profile graph
+        if profiler.overlay:
+            dirty.add(profiler.draw_overlay(screen))
+        profiler.lap(STAGE_HUD)
+
+        # Update the display (a full flip whenever the 3D view moved)
+        dirty.flush()
+        profiler.lap(STAGE_FLIP)
+        profiler.end_frame()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
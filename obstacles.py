@@ -0,0 +1,361 @@
+import numpy as np
+from constants import (ROAD_LANES, LANE_OFFSET, CAR_LENGTH, TRAFFIC_MIN_GAP, TRAFFIC_HEADWAY, TRAFFIC_ACCELERATION,
+                       TRAFFIC_BRAKING, TRAFFIC_LANE_CHANGE_RATE, TRAFFIC_HELD_UP, TRAFFIC_LANE_CHANGE_TIME)
+
+# Lanes are numbered -LANE_SHIFT .. LANE_SHIFT (-1: left, 0: center, 1: right)
+LANE_SHIFT = ROAD_LANES // 2
+
+# Spatial index of cars keyed by segment number
+#
+# Car numbers are kept sorted by segment, so the cars of one segment (its bucket) form a
+# contiguous run of `order` and any window of segments is found with two binary searches.
+class SegmentIndex:
+    def __init__(self):
+        self.total_segments = 0
+
+        # Current segment of each car
+        self.segment = np.zeros(0, dtype=np.int64)
+
+        # Car numbers sorted by segment, and the segments in that order
+        self.order = np.zeros(0, dtype=np.int64)
+        self.sorted_segment = np.zeros(0, dtype=np.int64)
+
+    def build(self, car_segment, total_segments):
+        """Indexes every car from scratch"""
+        self.total_segments = total_segments
+        self.segment = car_segment.copy()
+        self.order = np.argsort(car_segment, kind='stable')
+        self.sorted_segment = self.segment[self.order]
+
+    def update(self, car_segment):
+        """Moves the cars whose segment changed into their new buckets"""
+        moved = car_segment != self.segment
+        if not moved.any():
+            return
+        self.segment[moved] = car_segment[moved]
+
+        # Cars only move a segment or so per frame (or wrap to the start of the track), so the
+        # previous order is almost sorted and a stable sort of it is close to linear
+        resort = np.argsort(self.segment[self.order], kind='stable')
+        self.order = self.order[resort]
+        self.sorted_segment = self.segment[self.order]
+
+    def query(self, first_segment, count):
+        """Returns the cars in segments first_segment .. first_segment + count - 1, wrapping at the end of the track"""
+        first_segment %= self.total_segments
+        count = min(count, self.total_segments)
+        last_segment = first_segment + count
+
+        if last_segment <= self.total_segments:
+            return self._range(first_segment, last_segment)
+
+        # The window loops back to the start of the track
+        return np.concatenate((self._range(first_segment, self.total_segments),
+                               self._range(0, last_segment - self.total_segments)))
+
+    def snapshot(self):
+        """Returns a copy that answers queries while this index keeps changing"""
+        snapshot = SegmentIndex()
+        snapshot.total_segments = self.total_segments
+        snapshot.order = self.order.copy()
+        snapshot.sorted_segment = self.sorted_segment.copy()
+        return snapshot
+
+    def _range(self, first_segment, end_segment):
+        """Returns the cars in segments first_segment .. end_segment - 1 (no wrap-around)"""
+        start, end = np.searchsorted(self.sorted_segment, (first_segment, end_segment))
+        return self.order[start:end]
+
+# Cars of every lane sorted by position
+#
+# Cars are ordered by the key (lane + LANE_SHIFT) * road_length + z, so each lane is a contiguous
+# run of `order` sorted by z: the car ahead of another is the next one in its run (wrapping to
+# the first), and the cars around any point of a lane are one binary search away.
+class LaneIndex:
+    def __init__(self):
+        self.road_length = 1
+
+        # Car numbers sorted by key, and the keys in that order
+        self.order = np.zeros(0, dtype=np.int64)
+        self.sorted_key = np.zeros(0, dtype=np.float64)
+
+        # Where each lane's run starts in `order` (the last entry is the number of cars)
+        self.lane_start = np.zeros(ROAD_LANES + 1, dtype=np.int64)
+
+    def keys(self, z, lane):
+        """Returns the sort keys of positions in lanes"""
+        return (lane + LANE_SHIFT) * self.road_length + z
+
+    def build(self, z, lane, road_length):
+        """Indexes every car from scratch"""
+        self.road_length = float(road_length)
+        self.order = np.argsort(self.keys(z, lane), kind='stable')
+        self.update(z, lane)
+
+    def update(self, z, lane):
+        """Re-sorts the cars after they moved or changed lanes"""
+        key = self.keys(z, lane)
+
+        # Cars keep their order within a lane except when they overtake, change lanes or wrap, so
+        # the previous order is almost sorted and a stable sort of it is close to linear
+        resort = np.argsort(key[self.order], kind='stable')
+        self.order = self.order[resort]
+        self.sorted_key = key[self.order]
+        self.lane_start = np.searchsorted(self.sorted_key, np.arange(ROAD_LANES + 1) * self.road_length)
+
+    def leaders(self):
+        """Returns the number of the car ahead of every car in its lane (the car itself when alone)"""
+        count = len(self.order)
+        position = np.arange(count)
+        lane = np.repeat(np.arange(ROAD_LANES), np.diff(self.lane_start))
+        ahead = position + 1
+        ahead = np.where(ahead < self.lane_start[lane + 1], ahead, self.lane_start[lane])
+
+        leader = np.empty(count, dtype=np.int64)
+        leader[self.order] = self.order[ahead]
+        return leader
+
+    def around(self, z, lane):
+        """Returns the numbers of the cars just ahead of and just behind positions in lanes (-1 in empty lanes)"""
+        start = self.lane_start[lane + LANE_SHIFT]
+        end = self.lane_start[lane + LANE_SHIFT + 1]
+        position = np.searchsorted(self.sorted_key, self.keys(z, lane))
+
+        # Past the last car of a lane comes its first one, and the other way round
+        ahead = np.where(position < end, position, start)
+        behind = np.where(position > start, position - 1, end - 1)
+        last = max(len(self.order) - 1, 0)
+        empty = start == end
+        leader = np.where(empty, -1, self.order[np.clip(ahead, 0, last)])
+        follower = np.where(empty, -1, self.order[np.clip(behind, 0, last)])
+        return leader, follower
+
+# Cars on the road, stored as parallel arrays (one entry per car)
+class Obstacles:
+    def __init__(self):
+        # Position along the road, lane (-1: left, 0: center, 1: right) and type of each car
+        self.z = np.zeros(0, dtype=np.float64)
+        self.lane = np.zeros(0, dtype=np.int8)
+        self.type = np.zeros(0, dtype=np.int8)
+
+        # Desired and current speed factors relative to the player's maximum speed (a car drives
+        # slower than it wants to while held up by traffic)
+        self.speed = np.zeros(0, dtype=np.float64)
+        self.velocity = np.zeros(0, dtype=np.float64)
+
+        # Position across the road (normalized like the player's x): at the center of `lane`,
+        # or on the way there while changing lanes
+        self.x = np.zeros(0, dtype=np.float64)
+
+        # Lane a car is moving out of (its lane once it has arrived): until then it still takes up
+        # room in both lanes
+        self.from_lane = np.zeros(0, dtype=np.int8)
+
+        # Whether the car is ahead of the player or close behind
+        self.active = np.zeros(0, dtype=bool)
+
+        # Positions before the last update, and the positions to draw (interpolated between the two)
+        self.prev_z = np.zeros(0, dtype=np.float64)
+        self.prev_x = np.zeros(0, dtype=np.float64)
+        self.render_z = self.z
+        self.render_x = self.x
+
+        # Road the cars drive on (set by place)
+        self.segment_length = 1
+        self.total_segments = 0
+
+        # Cars bucketed by segment, and sorted by lane and position
+        self.index = SegmentIndex()
+        self.traffic = LaneIndex()
+
+        # Random generator for lane changes (seeded by place)
+        self.rng = np.random.default_rng()
+
+    def __len__(self):
+        return len(self.z)
+
+    def place(self, z, lane, speed, obj_type, segment_length, total_segments, seed=None):
+        """Replaces all cars with the given positions, lanes, speed factors and types (seed fixes their lane changes)"""
+        self.z = np.array(z, dtype=np.float64)
+        self.lane = np.array(lane, dtype=np.int8)
+        self.speed = np.array(speed, dtype=np.float64)
+        self.velocity = self.speed.copy()
+        self.x = self.lane * LANE_OFFSET
+        self.from_lane = self.lane.copy()
+        self.type = np.array(obj_type, dtype=np.int8)
+        self.active = np.ones(len(self.z), dtype=bool)
+        self.prev_z = self.z.copy()
+        self.prev_x = self.x.copy()
+        self.render_z = self.z
+        self.render_x = self.x
+        self.rng = np.random.default_rng(seed)
+
+        self.segment_length = segment_length
+        self.total_segments = total_segments
+        self.index.build(self.car_segments(), total_segments)
+        self.traffic.build(self.z, self.lane, total_segments * segment_length)
+
+    def snapshot(self):
+        """Returns a copy of what drawing reads, which stays valid while the cars keep moving
+
+        Only the types, activity, interpolated positions and segment index are copied, so the
+        pipelined loop can draw a frame while the simulation thread steps on.
+        """
+        snapshot = Obstacles()
+        snapshot.type = self.type.copy()
+        snapshot.active = self.active.copy()
+        snapshot.render_z = self.render_z.copy()
+        snapshot.render_x = self.render_x.copy()
+        snapshot.segment_length = self.segment_length
+        snapshot.total_segments = self.total_segments
+        snapshot.index = self.index.snapshot()
+        return snapshot
+
+    def car_segments(self):
+        """Returns the segment number of every car"""
+        return (self.z / self.segment_length).astype(np.int64)
+
+    def in_segments(self, first_segment, count):
+        """Returns the numbers of the cars in a window of count segments, wrapping at the end of the track"""
+        return self.index.query(first_segment, count)
+
+    def update(self, player_z, dt, player_speed, visible_segments):
+        """Drives, wraps and re-activates every car in whole-array operations"""
+        total_segments = self.total_segments
+        road_length = total_segments * self.segment_length
+        player_segment = int(player_z / self.segment_length)
+
+        np.copyto(self.prev_z, self.z)
+        np.copyto(self.prev_x, self.x)
+        gap = self.follow(dt, player_speed, road_length)
+        self.change_lanes(dt, gap, road_length)
+
+        # Move the cars at their new speeds, and across the road towards their lanes
+        self.z += self.velocity * player_speed * dt
+        self.render_z = self.z
+        step = LANE_OFFSET * dt / TRAFFIC_LANE_CHANGE_TIME
+        lane_x = self.lane * LANE_OFFSET
+        self.x = np.where(np.abs(lane_x - self.x) <= step, lane_x, self.x + np.clip(lane_x - self.x, -step, step))
+        self.render_x = self.x
+        self.from_lane = np.where(self.x == lane_x, self.lane, self.from_lane)
+
+        # Cars that reach the end of the track loop back
+        self.z -= road_length * (self.z >= road_length)
+
+        # Keep the indexes in step with the cars that changed segment, overtook or changed lanes
+        car_segment = self.car_segments()
+        self.index.update(car_segment)
+        self.traffic.update(self.z, self.lane)
+
+        # Segment distance from the player to each car
+        segment_diff = (car_segment - player_segment + total_segments) % total_segments
+
+        # Mark cars as active if they are ahead of the player or close behind
+        self.active = (segment_diff < visible_segments) | (segment_diff > total_segments - 50)
+
+    def follow(self, dt, player_speed, road_length):
+        """Sets every car's speed from the car ahead in its lane (Intelligent Driver Model). Returns the gaps to them."""
+        speed = self.speed * player_speed
+        velocity = self.velocity * player_speed
+        leader = self.traffic.leaders()
+
+        # Bumper-to-bumper distance to the car ahead, looping around the track (none ahead for a
+        # car alone in its lane)
+        gap = self.z[leader] - self.z
+        gap += road_length * (gap < 0)
+        gap -= CAR_LENGTH
+        gap[leader == np.arange(len(leader))] = np.inf
+
+        # Cars changing lanes are indexed in their new lane but still block the old one: they also
+        # keep behind the car ahead there, and the car behind there keeps behind them
+        changing = np.flatnonzero(self.from_lane != self.lane)
+        if len(changing):
+            z = self.z[changing]
+            ahead, behind = self.traffic.around(z, self.from_lane[changing])
+            ahead_gap = np.where(ahead >= 0, (self.z[ahead] - z) % road_length - CAR_LENGTH, np.inf)
+            closer = ahead_gap < gap[changing]
+            leader[changing[closer]] = ahead[closer]
+            gap[changing[closer]] = ahead_gap[closer]
+
+            # A car behind keeps to the nearest of the cars leaving its lane in front of it
+            behind_gap = np.where(behind >= 0, (z - self.z[behind]) % road_length - CAR_LENGTH, np.inf)
+            nearest = np.argsort(behind_gap, kind='stable')
+            nearest = nearest[np.unique(behind[nearest], return_index=True)[1]]
+            follower = behind[nearest]
+            closer = (follower >= 0) & (behind_gap[nearest] < gap[follower])
+            leader[follower[closer]] = changing[nearest[closer]]
+            gap[follower[closer]] = behind_gap[nearest[closer]]
+
+        # Gap wanted at this speed, growing while closing in on the car ahead
+        acceleration = TRAFFIC_ACCELERATION * player_speed
+        braking = TRAFFIC_BRAKING * player_speed
+        closing = velocity - self.velocity[leader] * player_speed
+        wanted = TRAFFIC_MIN_GAP + np.maximum(0, velocity * TRAFFIC_HEADWAY
+                                                 + velocity * closing / (2 * np.sqrt(acceleration * braking)))
+
+        # Speed up towards the desired speed, brake harder the more the gap falls short (squares
+        # are multiplied out, as float powers are much slower)
+        free = velocity / speed
+        free *= free
+        short = wanted / np.maximum(gap, 1)
+        accel = acceleration * (1 - free * free - short * short)
+        velocity = np.clip(velocity + accel * dt, 0, speed)
+        self.velocity = velocity / player_speed
+        return gap
+
+    def change_lanes(self, dt, gap, road_length):
+        """Moves some held-up cars to a neighboring lane with room in it, given the gaps ahead of every car"""
+        # Held-up cars that are not already changing lanes try now and then
+        held_up = (self.velocity < self.speed * TRAFFIC_HELD_UP) & (self.from_lane == self.lane)
+        candidates = np.flatnonzero(held_up)
+        if len(candidates) == 0:
+            return
+        candidates = candidates[self.rng.random(len(candidates)) < TRAFFIC_LANE_CHANGE_RATE * dt]
+        if len(candidates) == 0:
+            return
+
+        # Pick a side at random, the only one there is from an outer lane
+        lane = self.lane[candidates]
+        target = lane + self.rng.choice((-1, 1), len(candidates)).astype(np.int8)
+        target = np.where(np.abs(target) > LANE_SHIFT, 2 * lane - target, target)
+
+        # Change when the target lane leaves more room ahead and a safe gap on both sides
+        safe = self.room_to_change(candidates, target, gap, road_length)
+
+        # Cars that change in the same step could pick the same gap: check them again one by
+        # one, each against the lanes as the cars before it left them
+        for car, car_target in zip(candidates[safe], target[safe]):
+            car = np.array([car])
+            car_target = np.array([car_target])
+            if self.room_to_change(car, car_target, gap, road_length)[0]:
+                self.from_lane[car] = self.lane[car]
+                self.lane[car] = car_target
+                self.traffic.update(self.z, self.lane)
+
+    def room_to_change(self, cars, target, gap, road_length):
+        """Returns whether each car has room to move into its target lane
+
+        The target lane must leave more room ahead than the car has now, and a safe gap on both
+        sides to the cars in that lane or still moving out of it.
+        """
+        z = self.z[cars]
+        leader, follower = self.traffic.around(z, target)
+        ahead = np.where(leader >= 0, (self.z[leader] - z) % road_length - CAR_LENGTH, np.inf)
+        behind = np.where(follower >= 0, (z - self.z[follower]) % road_length - CAR_LENGTH, np.inf)
+
+        leaving = np.flatnonzero(self.from_lane != self.lane)
+        if len(leaving):
+            distance = (self.z[leaving] - z[:, None]) % road_length
+            in_target = self.from_lane[leaving] == target[:, None]
+            ahead = np.minimum(ahead, np.where(in_target, distance - CAR_LENGTH, np.inf).min(axis=1))
+            behind = np.minimum(behind, np.where(in_target, road_length - distance - CAR_LENGTH, np.inf).min(axis=1))
+
+        return (ahead > gap[cars]) & (ahead > TRAFFIC_MIN_GAP) & (behind > TRAFFIC_MIN_GAP)
+
+    def interpolate(self, alpha):
+        """Sets render_z and render_x a fraction alpha of the way from the previous positions to the current ones"""
+        road_length = self.total_segments * self.segment_length
+        render_z = self.prev_z + ((self.z - self.prev_z) % road_length) * alpha
+        render_z -= road_length * (render_z >= road_length)
+        self.render_z = render_z
+        self.render_x = self.prev_x + (self.x - self.prev_x) * alpha
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Simulation steps run on a worker thread, one frame ahead of drawing (main.py --pipelined)
+#
+# Handoff: start() gives the worker the steps of the next frame and wait() returns once they are
+# done. Between start() and wait() the worker owns the simulation state (player, cars, and the
+# ring of an endless road): the main thread must not read or change it, and draws from copies
+# taken before start() instead (camera placement and Obstacles.snapshot). Between wait() and the
+# next start() the main thread owns everything. Drawing only overlaps with simulation where
+# pygame and NumPy release the GIL (blits, fills, scaling, flips and large array operations).
+#
+# Each frame shows the state the previous frame's steps produced, so input shows up one frame
+# later than in the serial loop. An endless road stays valid while drawing because the worker
+# only rewrites ring slots the margin behind the player, far outside the drawn window.
+class SimulationPipeline:
+    def __init__(self, simulation, recorder=None, play_through=False):
+        self.simulation = simulation
+        self.recorder = recorder
+
+        # Whether to keep stepping after a collision or the win (benchmarks), instead of
+        # stopping like the game
+        self.play_through = play_through
+
+        # Steps that hit a car
+        self.collisions = 0
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='simulation')
+        self.pending = None
+
+    def start(self, masks):
+        """Hands the worker one step per input mask (call wait first)"""
+        if masks:
+            self.pending = self.executor.submit(self.run, masks)
+
+    def wait(self):
+        """Waits for the steps handed over last (re-raising any error from them)"""
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            pending.result()
+
+    def run(self, masks):
+        """Runs steps on the worker thread"""
+        simulation = self.simulation
+        for mask in masks:
+            if simulation.finished() and not self.play_through:
+                break
+            if self.recorder is not None:
+                self.recorder.record(mask)
+            if simulation.step(mask):
+                self.collisions += 1
+
+    def close(self):
+        """Waits for the running steps and stops the worker"""
+        self.wait()
+        self.executor.shutdown()
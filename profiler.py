@@ -0,0 +1,186 @@
+import csv
+import json
+import time
+import numpy as np
+import pygame
+from constants import PROFILE_FRAMES, PROFILE_GRAPH_HEIGHT, PROFILE_GRAPH_MS
+
+# Frame stages, in the order they run ('wait' is the time the pipelined loop waits for the
+# simulation thread, whose own steps are not timed)
+STAGES = ('events', 'player', 'camera', 'obstacles', 'collision', 'wait', 'background', 'road', 'sprites', 'scale',
+          'hud', 'flip')
+STAGE_EVENTS = 0
+STAGE_PLAYER = 1
+STAGE_CAMERA = 2
+STAGE_OBSTACLES = 3
+STAGE_COLLISION = 4
+STAGE_WAIT = 5
+STAGE_BACKGROUND = 6
+STAGE_ROAD = 7
+STAGE_SPRITES = 8
+STAGE_SCALE = 9
+STAGE_HUD = 10
+STAGE_FLIP = 11
+
+# Graph color of each stage
+STAGE_COLORS = [
+    (128, 128, 128), (66, 135, 245), (90, 200, 250), (245, 166, 35), (208, 2, 27),
+    (139, 87, 42), (126, 211, 33), (189, 16, 224), (248, 231, 28), (255, 128, 170),
+    (255, 255, 255), (80, 227, 194)
+]
+
+# Per-stage frame timer
+#
+# Code calls lap(stage) right after each stage, which charges the time since the previous lap (or
+# begin_frame) to that stage; stages that run several times a frame (the simulation steps) add up.
+# Finished frames go into a ring buffer of the last PROFILE_FRAMES frames. While disabled every
+# call returns straight away.
+class FrameProfiler:
+    def __init__(self, frames=PROFILE_FRAMES):
+        self.enabled = False
+
+        # Milliseconds per stage of the last frames, and the number of frames recorded so far
+        self.times = np.zeros((frames, len(STAGES)), dtype=np.float32)
+        self.count = 0
+
+        # Stage times of the frame in progress
+        self.current = [0.0] * len(STAGES)
+        self.mark = 0.0
+
+        # On-screen graph (one column per frame) and its stage legend
+        self.overlay = False
+        self.graph = None
+        self.graphed = 0
+        self.legend = []
+        self.font = None
+
+    def enable(self, enabled=True):
+        """Starts or stops recording frames"""
+        self.enabled = enabled
+        self.mark = time.perf_counter()
+
+    def reset(self):
+        """Forgets the recorded frames"""
+        self.count = 0
+        self.graphed = 0
+        self.legend = []
+
+    def toggle_overlay(self):
+        """Shows or hides the on-screen graph (showing it starts recording)"""
+        self.overlay = not self.overlay
+        if self.overlay and not self.enabled:
+            self.enable()
+
+    def begin_frame(self):
+        """Starts timing a frame"""
+        if not self.enabled:
+            return
+        self.current = [0.0] * len(STAGES)
+        self.mark = time.perf_counter()
+
+    def lap(self, stage):
+        """Charges the time since the previous lap to a stage"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[stage] += now - self.mark
+        self.mark = now
+
+    def lap_stage(self, name):
+        """Charges the time since the previous lap to a stage given by name (Simulation's lap hook)"""
+        if not self.enabled:
+            return
+        self.lap(STAGES.index(name))
+
+    def end_frame(self):
+        """Stores the finished frame in the ring buffer"""
+        if not self.enabled:
+            return
+        self.times[self.count % len(self.times)] = [seconds * 1000 for seconds in self.current]
+        self.count += 1
+
+    def frames(self):
+        """Returns the recorded stage times in milliseconds, oldest frame first"""
+        size = len(self.times)
+        if self.count <= size:
+            return self.times[:self.count].copy()
+        start = self.count % size
+        return np.concatenate((self.times[start:], self.times[:start]))
+
+    def summary(self):
+        """Returns the mean, 95th percentile and maximum milliseconds of each stage"""
+        frames = self.frames()
+        if not len(frames):
+            return {}
+        return {
+            stage: {
+                'mean': float(frames[:, i].mean()),
+                'p95': float(np.percentile(frames[:, i], 95)),
+                'max': float(frames[:, i].max())
+            }
+            for i, stage in enumerate(STAGES)
+        }
+
+    def export(self, path):
+        """Writes the recorded frames to a CSV file, or to JSON if the path ends in .json"""
+        frames = self.frames()
+        first = self.count - len(frames)
+        if path.endswith('.json'):
+            data = {
+                'stages': list(STAGES),
+                'summary': self.summary(),
+                'frames': [dict(frame=first + n, **dict(zip(STAGES, row.tolist())))
+                           for n, row in enumerate(frames)]
+            }
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=2)
+        else:
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['frame', *STAGES, 'total'])
+                for n, row in enumerate(frames):
+                    writer.writerow([first + n, *(f'{ms:.4f}' for ms in row), f'{row.sum():.4f}'])
+
+    def draw_overlay(self, screen):
+        """Draws the stage graph of the last frames in the top right corner. Returns the drawn area."""
+        width = len(self.times)
+        if self.graph is None:
+            self.graph = pygame.Surface((width, PROFILE_GRAPH_HEIGHT)).convert()
+            self.graph.fill((0, 0, 0))
+            self.font = pygame.font.SysFont(None, 20)
+
+        # Scroll in a column for every frame recorded since the last draw
+        new_frames = min(self.count - self.graphed, width)
+        if new_frames > 0:
+            self.graph.scroll(-new_frames, 0)
+            self.graph.fill((0, 0, 0), (width - new_frames, 0, new_frames, PROFILE_GRAPH_HEIGHT))
+            scale = PROFILE_GRAPH_HEIGHT / PROFILE_GRAPH_MS
+            for n in range(new_frames):
+                x = width - new_frames + n
+                y = PROFILE_GRAPH_HEIGHT
+                for ms, color in zip(self.times[(self.count - new_frames + n) % width].tolist(), STAGE_COLORS):
+                    height = ms * scale
+                    if height >= 0.5:
+                        self.graph.fill(color, (x, round(y - height), 1, max(1, round(height))))
+                    y -= height
+
+            # Average stage times, re-rendered twice a second or so
+            if not self.legend or self.count // 30 != self.graphed // 30:
+                means = self.frames()[-width:].mean(axis=0).tolist()
+                self.legend = [self.font.render(f"{stage} {ms:.2f} ms", True, color)
+                               for stage, ms, color in zip(STAGES, means, STAGE_COLORS)]
+            self.graphed = self.count
+
+        # Legend to the left of the graph
+        legend_width = max(line.get_width() for line in self.legend) if self.legend else 0
+        line_height = self.font.get_linesize()
+        height = max(PROFILE_GRAPH_HEIGHT, line_height * len(self.legend))
+        area = pygame.Rect(screen.get_width() - width - legend_width - 30, 10, width + legend_width + 20, height + 10)
+        screen.fill((0, 0, 0), area)
+        screen.blits([(line, (area.x + 5, area.y + 5 + i * line_height)) for i, line in enumerate(self.legend)],
+                     doreturn=False)
+        screen.blit(self.graph, (area.right - width - 5, area.y + 5))
+        return area
+
+# Profiler shared by the game loop and the code it times
+profiler = FrameProfiler()
@@ -0,0 +1,81 @@
+import logging
+import pygame
+from constants import (SCREEN_WIDTH, SCREEN_HEIGHT, QUALITY_LEVELS, QUALITY_BUDGET_MS, QUALITY_WINDOW,
+                       QUALITY_DROP, QUALITY_RAISE, QUALITY_COOLDOWN)
+
+logger = logging.getLogger(__name__)
+
+# Adaptive rendering quality
+#
+# Every QUALITY_WINDOW frames the governor averages the frame work time (without the time spent
+# waiting for the frame rate cap) and steps down one quality level when it is over
+# QUALITY_DROP of the budget, or up one level when it is under QUALITY_RAISE of it. The gap between
+# the two thresholds and the cooldown after every change keep it from flipping back and forth.
+# A pinned governor applies its level once and never changes it.
+class QualityGovernor:
+    def __init__(self, levels=QUALITY_LEVELS, budget_ms=QUALITY_BUDGET_MS, level=None, pinned=False):
+        self.levels = levels
+        self.budget_ms = budget_ms
+        self.level = len(levels) - 1 if level is None else level
+        self.pinned = pinned
+
+        # Frame times of the current window, and frames left before the next change is allowed
+        self.times = []
+        self.cooldown = QUALITY_COOLDOWN
+
+        # Reduced-resolution frame surfaces, keyed by render scale
+        self.frames = {}
+
+    def settings(self):
+        """Returns the (render scale, view factor, smooth sprites, moving layers) of the current level"""
+        return self.levels[self.level]
+
+    def apply(self, circuit, background, level):
+        """Sets the view distance, sprite scaling and background layers of the current level"""
+        _, view_factor, smooth, moving_layers = self.settings()
+        circuit.visible_segments = max(1, int(level.view_distance * view_factor))
+        circuit.sprite_cache.set_smooth(smooth)
+        circuit.scenery_cache.set_smooth(smooth)
+        background.moving_layers = moving_layers
+
+    def frame(self):
+        """Returns the surface the 3D view is drawn to at the current level (None for the screen itself)"""
+        scale = self.settings()[0]
+        if scale >= 1:
+            return None
+        if scale not in self.frames:
+            size = (round(SCREEN_WIDTH * scale), round(SCREEN_HEIGHT * scale))
+            self.frames[scale] = pygame.Surface(size).convert()
+        return self.frames[scale]
+
+    def update(self, frame_ms):
+        """Records the work time of a frame. Returns True when the level changed."""
+        if self.pinned:
+            return False
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+
+        self.times.append(frame_ms)
+        if len(self.times) < QUALITY_WINDOW:
+            return False
+        average = sum(self.times) / len(self.times)
+        self.times = []
+
+        previous = self.level
+        if average > self.budget_ms * QUALITY_DROP and self.level > 0:
+            self.level -= 1
+        elif average < self.budget_ms * QUALITY_RAISE and self.level < len(self.levels) - 1:
+            self.level += 1
+        if self.level == previous:
+            return False
+
+        self.cooldown = QUALITY_COOLDOWN
+        logger.info("quality %d -> %d (%s), frame time %.1f ms", previous, self.level, self.describe(), average)
+        return True
+
+    def describe(self):
+        """Returns a short description of the current level"""
+        scale, view_factor, smooth, moving_layers = self.settings()
+        return (f"{scale:.0%} resolution, {view_factor:.0%} view, "
+                f"{'smooth' if smooth else 'fast'} sprites, {'moving' if moving_layers else 'static'} background")
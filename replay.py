@@ -0,0 +1,193 @@
+# replay.py
+# Deterministic run recording and replay.
+#
+# A recording holds the seed, the level, the road mode and the per-tick driving input as run-length
+# encoded (ticks, key mask) pairs, which is enough to reproduce a run exactly because the
+# simulation advances in fixed SIM_DT steps.
+#
+#   python main.py --record run.rpl                  record a game
+#   python replay.py run.rpl                         replay headless at unlimited speed
+#   python replay.py run.rpl --render [--window]     replay and render frames as fast as possible
+import os
+import argparse
+import json
+import struct
+import time
+import pygame
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, SIM_HZ
+from assets import AssetManager
+from background import Background
+from collision import MaskCollider
+from simulation import LEVELS, InputProvider, Simulation, create_simulation
+
+# File layout: header, level name, run count, then (ticks, key mask) runs
+MAGIC = b'P3DR'
+VERSION = 2
+HEADER = struct.Struct('<4sBHQBB')  # magic, version, simulation rate, seed, flags, level name length
+FLAG_ENDLESS = 1
+COUNT = struct.Struct('<I')
+RUN = struct.Struct('<HB')
+MAX_RUN = 0xFFFF
+
+class InputRecorder:
+    def __init__(self, seed, level_name, endless=False, sim_hz=SIM_HZ):
+        self.seed = seed
+        self.level_name = level_name
+        self.endless = endless
+        self.sim_hz = sim_hz
+
+        # [ticks, key mask] runs
+        self.runs = []
+
+    def record(self, mask):
+        """Appends the input of one simulation tick"""
+        if self.runs and self.runs[-1][1] == mask and self.runs[-1][0] < MAX_RUN:
+            self.runs[-1][0] += 1
+        else:
+            self.runs.append([1, mask])
+
+    def ticks(self):
+        """Returns the number of recorded ticks"""
+        return sum(count for count, _ in self.runs)
+
+    def save(self, path):
+        """Writes the recording to a binary file"""
+        name = self.level_name.encode('utf-8')
+        with open(path, 'wb') as f:
+            flags = FLAG_ENDLESS if self.endless else 0
+            f.write(HEADER.pack(MAGIC, VERSION, self.sim_hz, self.seed, flags, len(name)))
+            f.write(name)
+            f.write(COUNT.pack(len(self.runs)))
+            f.write(b''.join(RUN.pack(count, mask) for count, mask in self.runs))
+
+class InputReplay(InputProvider):
+    def __init__(self, seed, level_name, runs, endless=False, sim_hz=SIM_HZ):
+        self.seed = seed
+        self.level_name = level_name
+        self.endless = endless
+        self.sim_hz = sim_hz
+        self.runs = runs
+
+        # Playback position
+        self.run = 0
+        self.tick = 0
+
+    @classmethod
+    def load(cls, path):
+        """Reads a recording written by InputRecorder.save"""
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, sim_hz, seed, flags, name_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} recording")
+        offset = HEADER.size
+        level_name = data[offset:offset + name_length].decode('utf-8')
+        offset += name_length
+        (run_count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        runs = [list(run) for run in RUN.iter_unpack(data[offset:offset + run_count * RUN.size])]
+
+        return cls(seed, level_name, runs, bool(flags & FLAG_ENDLESS), sim_hz)
+
+    def ticks(self):
+        """Returns the number of recorded ticks"""
+        return sum(count for count, _ in self.runs)
+
+    def next(self):
+        """Returns the key mask of the next tick (no keys once the recording is exhausted)"""
+        while self.run < len(self.runs):
+            count, mask = self.runs[self.run]
+            if self.tick < count:
+                self.tick += 1
+                return mask
+            self.run += 1
+            self.tick = 0
+        return 0
+
+def replay(path, render=False, fps=60):
+    """Replays a recording until it ends, the player collides or wins, and returns a summary"""
+    recording = InputReplay.load(path)
+    if recording.sim_hz != SIM_HZ:
+        raise ValueError(f"recorded at {recording.sim_hz} Hz, the simulation runs at {SIM_HZ} Hz")
+    level = LEVELS[recording.level_name]
+
+    if render:
+        # Imported here because main imports this module for recording
+        from main import setup_game, update_view, render_scene
+
+        pygame.init()
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        assets = AssetManager()
+        background = Background(assets)
+        circuit, camera, player = setup_game(assets, level, recording.seed, recording.endless)
+        simulation = Simulation(circuit, player)
+    else:
+        # Without rendering the simulation runs on its own, with no display
+        simulation = create_simulation(level, recording.seed, recording.endless)
+        player = simulation.player
+        player.collider = MaskCollider.load()
+
+    # Render one frame every this many ticks
+    frame_ticks = max(1, SIM_HZ // fps)
+    frame_times = []
+
+    ticks = recording.ticks()
+    begin = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        simulation.step(recording.next())
+
+        if render and (tick % frame_ticks == 0 or simulation.finished()):
+            start = time.perf_counter()
+            pygame.event.pump()
+            update_view(1.0, circuit, camera, player)
+            render_scene(screen, background, circuit, camera, player)
+            pygame.display.flip()
+            frame_times.append((time.perf_counter() - start) * 1000)
+
+        if simulation.finished():
+            break
+    elapsed = time.perf_counter() - begin
+    if render:
+        pygame.quit()
+
+    summary = {
+        'level': recording.level_name,
+        'seed': recording.seed,
+        'endless': recording.endless,
+        'ticks': tick if ticks else 0,
+        'recorded_ticks': ticks,
+        'outcome': simulation.outcome() if simulation.finished() else 'ended',
+        'player_x': player.x,
+        'player_z': player.z,
+        'distance': player.distance,
+        'score': int(player.distance / 100),
+        'seconds': elapsed,
+        'ticks_per_second': (tick if ticks else 0) / elapsed if elapsed > 0 else 0.0
+    }
+    if frame_times:
+        summary['frames'] = len(frame_times)
+        summary['frame_mean_ms'] = sum(frame_times) / len(frame_times)
+        summary['frame_max_ms'] = max(frame_times)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded run")
+    parser.add_argument('recording', help="file written by main.py --record")
+    parser.add_argument('--render', action='store_true', help="render frames while replaying")
+    parser.add_argument('--window', action='store_true', help="show the frames in a window")
+    parser.add_argument('--fps', type=int, default=60, help="simulated frame rate when rendering")
+    parser.add_argument('--output', help="write the summary to a JSON file")
+    args = parser.parse_args()
+
+    if not args.window:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+    summary = replay(args.recording, args.render, args.fps)
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
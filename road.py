@@ -0,0 +1,282 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+import numpy as np
+from constants import COLOR_LIGHT, COLOR_DARK, ROAD_LOD_LANES, ROAD_LOD_RUMBLE, ROAD_LOD_MERGE_HEIGHT, ROAD_BANDS
+
+# Road geometry batcher
+#
+# Consecutive drawn segments that share a color band (a RUMBLE_SEGMENTS group) form one strip.
+# The quads of a strip share their edges, so each strip is drawn as one grass rect, one road
+# polygon, two rumble polygons and one polygon per lane line, with the same pixels as drawing
+# the segments one by one.
+#
+# Distant strips are drawn with less detail: lane lines stop ROAD_LOD_LANES segments away and
+# rumble strips ROAD_LOD_RUMBLE segments away. Beyond that, runs of bands thinner than
+# ROAD_LOD_MERGE_HEIGHT pixels are merged into one span of grass and road in the average of the
+# light and dark colors.
+class RoadBatcher:
+    def __init__(self, road_lanes):
+        self.road_lanes = road_lanes
+
+        # Level-of-detail distances (window positions) and merge height
+        self.lod_lanes = ROAD_LOD_LANES
+        self.lod_rumble = ROAD_LOD_RUMBLE
+        self.merge_height = ROAD_LOD_MERGE_HEIGHT
+
+        # Statistics of the last frame
+        self.strips = 0
+        self.spans = 0
+        self.draw_calls = 0
+
+    def build_strips(self, drawn, colors):
+        """Groups drawn segments into (first, last) runs of consecutive segments with the same color"""
+        if len(drawn) == 0:
+            return []
+
+        # A strip ends where the next drawn segment is not adjacent or changes color
+        drawn_colors = colors[drawn]
+        breaks = np.flatnonzero((np.diff(drawn) != 1) | (np.diff(drawn_colors) != 0)) + 1
+        firsts = drawn[np.concatenate(([0], breaks))]
+        lasts = drawn[np.concatenate((breaks - 1, [len(drawn) - 1]))]
+        return list(zip(firsts.tolist(), lasts.tolist()))
+
+    def draw(self, screen, screen_x, screen_y, screen_w, drawn, colors, palette):
+        """Draws the drawn segments of a projected window as merged strips
+
+        Segment n of the window spans from projected point n - 1 (near edge) to point n (far edge).
+        """
+        strips = self.build_strips(drawn, colors)
+
+        # Plain lists are much faster than NumPy scalars in the drawing loop
+        xs = screen_x.tolist()
+        ys = screen_y.tolist()
+        ws = screen_w.tolist()
+        colors = colors.tolist()
+
+        # The first segment can reach down to or below its near edge (which lies behind the camera
+        # and is not clipped) instead of stepping up the screen: it gets a strip of its own
+        if strips and ys[strips[0][0]] >= ys[strips[0][0] - 1] and strips[0][0] < strips[0][1]:
+            first, last = strips[0]
+            strips[:1] = [(first, first), (first + 1, last)]
+
+        self.strips = 0
+        self.spans = 0
+        self.draw_calls = 0
+        span = []
+        for first, last in strips:
+            height = ys[first - 1] - ys[last]
+
+            # Far and thin: collect into the current span
+            if first >= self.lod_rumble and height < self.merge_height:
+                span.append((first, last))
+                continue
+            if span:
+                self.draw_span(screen, xs, ys, ws, span, palette)
+                span = []
+
+            # Drop strips that project to under one pixel (a lone first segment can be upside down)
+            if abs(height) < 1:
+                continue
+            self.draw_strip(screen, xs, ys, ws, first, last, palette[colors[first]],
+                            lanes=first < self.lod_lanes, rumble=first < self.lod_rumble)
+            self.strips += 1
+        if span:
+            self.draw_span(screen, xs, ys, ws, span, palette)
+
+    def draw_span(self, screen, xs, ys, ws, span, palette):
+        """Draws a run of thin strips as one band of grass and road in the averaged light and dark colors"""
+        # Projected points of the strips, near to far (strips after a gap start from a hidden point)
+        points = []
+        for first, last in span:
+            start = first - 1 if not points or points[-1] != first - 1 else first
+            points.extend(range(start, last + 1))
+        y_near = ys[points[0]]
+        y_far = ys[points[-1]]
+        if y_near - y_far < 1:
+            return
+
+        light = palette[COLOR_LIGHT]
+        dark = palette[COLOR_DARK]
+        grass = [(a + b) // 2 for a, b in zip(light['grass'], dark['grass'])]
+        road = [(a + b) // 2 for a, b in zip(light['road'], dark['road'])]
+
+        pygame.draw.rect(screen, grass, (0, y_far, screen.get_width(), y_near - y_far))
+        pygame.draw.polygon(screen, road,
+                            [(xs[k] - ws[k], ys[k]) for k in points] +
+                            [(xs[k] + ws[k], ys[k]) for k in reversed(points)])
+        self.spans += 1
+        self.draw_calls += 2
+
+    def draw_strip(self, screen, xs, ys, ws, first, last, color, lanes=True, rumble=True):
+        """Draws segments first .. last as one strip of a single color band (optionally without lane lines or rumble strips)"""
+        # Projected points from the near edge of the first segment to the far edge of the last one
+        points = range(first - 1, last + 1)
+        y_near = ys[first - 1]
+        y_far = ys[last]
+
+        # Draw grass
+        pygame.draw.rect(screen, color['grass'], (0, y_far, screen.get_width(), y_near - y_far))
+
+        # Draw road: up the left edge and back down the right edge
+        left = [(xs[k] - ws[k], ys[k]) for k in points]
+        right = [(xs[k] + ws[k], ys[k]) for k in reversed(points)]
+        pygame.draw.polygon(screen, color['road'], left + right)
+
+        self.draw_calls += 2
+
+        # Draw rumble strips
+        if rumble:
+            rumble_left = [(xs[k] - ws[k] - ws[k] / 5, ys[k]) for k in points]
+            rumble_right = [(xs[k] + ws[k] + ws[k] / 5, ys[k]) for k in points]
+            pygame.draw.polygon(screen, color['rumble'], rumble_left + left[::-1])
+            pygame.draw.polygon(screen, color['rumble'], rumble_right + right)
+            self.draw_calls += 2
+
+        # Draw lanes
+        if lanes and 'lane' in color:
+            lines = [[] for _ in range(1, self.road_lanes)]
+            for k in points:
+                x, y, w = xs[k], ys[k], ws[k]
+                line_w = (w / 20) / 2
+                lane_w = (w * 2) / self.road_lanes
+                lane_x = x - w
+                for line in lines:
+                    lane_x += lane_w
+                    line.append((lane_x, y, line_w))
+
+            for line in lines:
+                pygame.draw.polygon(screen, color['lane'],
+                                    [(x - line_w, y) for x, y, line_w in line] +
+                                    [(x + line_w, y) for x, y, line_w in reversed(line)])
+                self.draw_calls += 1
+
+# Banded road rasterizer
+#
+# Fills the road straight into the pixels of the screen, with the same pixels as drawing the
+# segments one by one with pygame.draw (Circuit.draw_segment). The screen is split into horizontal
+# bands that are filled on a thread pool; NumPy releases the GIL in its inner loops, so bands can
+# fill in parallel.
+#
+# The drawn segments must step up the screen: each one's near edge lies on the row of the previous
+# one's far edge. A row then belongs to one segment (its grass and its road, rumble and lane spans),
+# and the far edge row of a segment is also the near edge row of the next, whose spans are drawn
+# over it. pygame fills a polygon row by row between its edge crossings, at
+# int(x1 + (y - y1) * (x2 - x1) / (y2 - y1)) along each edge from the corners truncated to
+# integers, so each span is computed the same way. The rows of a band are cut at both ends of
+# every span into runs of the color drawn last there, and written with one repeat.
+class BandedRasterizer:
+    def __init__(self, road_lanes, bands=ROAD_BANDS):
+        self.road_lanes = road_lanes
+
+        # More bands than cores would only add handoffs
+        self.bands = min(bands, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.bands, thread_name_prefix='road')
+
+    def map_palette(self, screen, palette):
+        """Returns the pixel values of every palette entry as [grass, road, rumble, rumble, lane...]"""
+        mapped = []
+        for color in palette:
+            lane = screen.map_rgb(color['lane']) if 'lane' in color else 0
+            mapped.append([screen.map_rgb(color['grass']), screen.map_rgb(color['road']),
+                           screen.map_rgb(color['rumble']), screen.map_rgb(color['rumble'])] +
+                          [lane] * (self.road_lanes - 1))
+        return np.array(mapped, dtype=np.int64)
+
+    def edges(self, x, w):
+        """Returns the corners of the road, rumble and lane quads along one edge of segments
+
+        x and w are the centers and half-widths of the edge, and the result has the left and right
+        corner of every quad, truncated like pygame does.
+        """
+        x = x.astype(np.int64)
+        w = w.astype(np.int64)
+        rumble_w = w / 5
+        corners = [(x - w, x + w), (x - w - rumble_w, x - w), (x + w, x + w + rumble_w)]
+
+        line_w = (w / 20) / 2
+        lane_w = (w * 2) / self.road_lanes
+        lane_x = x - w
+        for _ in range(1, self.road_lanes):
+            lane_x = lane_x + lane_w
+            corners.append((lane_x - line_w, lane_x + line_w))
+        return np.array(corners).astype(np.int64).transpose(2, 0, 1)
+
+    def draw(self, screen, screen_x, screen_y, screen_w, drawn, colors, palette):
+        """Draws the drawn segments of a projected window (see RoadBatcher.draw)"""
+        if len(drawn) == 0:
+            return
+        width, height = screen.get_size()
+
+        # Near and far edge rows and quad corners of every segment (segment, quad, left/right)
+        near_y = screen_y[drawn - 1].astype(np.int64)
+        far_y = screen_y[drawn].astype(np.int64)
+        near = self.edges(screen_x[drawn - 1], screen_w[drawn - 1])
+        far = self.edges(screen_x[drawn], screen_w[drawn])
+
+        # Colors of the grass and quads, and which quads are drawn (only some colors have lane lines)
+        segment_colors = colors[drawn]
+        pixels = self.map_palette(screen, palette)[segment_colors]
+        quads = near.shape[1]
+        lanes = np.array(['lane' in color for color in palette])[segment_colors]
+        enabled = np.ones((len(drawn), quads), dtype=bool)
+        enabled[:, 3:] = lanes[:, None]
+        segments = (near_y, far_y, near, far, pixels, enabled)
+
+        # The rows the segments own, from the far edge of the last one to the near edge of the first
+        top = max(int(far_y[-1]), 0)
+        bottom = min(int(near_y[0]), height)
+        view = pygame.surfarray.pixels2d(screen).T
+        if top < bottom:
+            rows = np.linspace(top, bottom, min(self.bands, bottom - top) + 1).astype(np.int64)
+            bands = [self.executor.submit(self.fill_band, view, first, last, width, segments)
+                     for first, last in zip(rows[:-1], rows[1:])]
+            for band in bands:
+                band.result()
+
+        # The near edge row of the first segment is owned by whatever is below it: only its spans are drawn
+        if 0 <= near_y[0] < height:
+            row = view[near_y[0]]
+            for quad in np.flatnonzero(enabled[0]):
+                left, right = sorted(near[0, quad].tolist())
+                if right >= 0 and left < width:
+                    row[max(left, 0):right + 1] = pixels[0, quad + 1]
+        del view
+
+    def fill_band(self, view, first, last, width, segments):
+        """Fills rows first .. last - 1 of a pixel array view"""
+        near_y, far_y, near, far, pixels, enabled = segments
+        y = np.arange(first, last)
+
+        # Segment owning each row (far edges ascend up the screen in reverse), and the next segment,
+        # whose near edge is on the owner's far edge row
+        owner = len(far_y) - np.searchsorted(far_y[::-1], y, side='right')
+        capped = (y == far_y[owner]) & (owner + 1 < len(far_y))
+        cap = np.where(capped, owner + 1, owner)
+
+        # Edge crossings of the owner's quads on each row, and the cap's near edge
+        step = ((y - far_y[owner])[:, None, None] * (near[owner] - far[owner]) /
+                (near_y[owner] - far_y[owner])[:, None, None] + far[owner]).astype(np.int64)
+        crossings = np.concatenate((step, near[cap]), axis=1)
+        drawn = np.concatenate((enabled[owner], enabled[cap] & capped[:, None]), axis=1)
+
+        # Spans of the grass and then every quad in drawing order, as start and end columns clipped
+        # to the row (spans off the row end where they start), and a bit for each drawn span
+        rows = len(y)
+        spans = 1 + crossings.shape[1]
+        starts = np.zeros((rows, spans), dtype=np.int64)
+        ends = np.full((rows, spans), width, dtype=np.int64)
+        np.clip(np.minimum(crossings[:, :, 0], crossings[:, :, 1]), 0, width, out=starts[:, 1:])
+        np.clip(np.maximum(crossings[:, :, 0], crossings[:, :, 1]) + 1, 0, width, out=ends[:, 1:])
+        bits = np.where(np.concatenate((np.ones((rows, 1), dtype=bool), drawn), axis=1), 1 << np.arange(spans), 0)
+        span_pixels = np.concatenate((pixels[owner], pixels[cap, 1:]), axis=1)
+
+        # Cut the rows at every span start and end: adding up the bits going in and out gives the
+        # spans covering each run, and the highest one is drawn last
+        cuts = np.concatenate((starts, ends), axis=1)
+        order = np.argsort(cuts, axis=1, kind='stable')
+        cuts = np.take_along_axis(cuts, order, axis=1)
+        covering = np.cumsum(np.take_along_axis(np.concatenate((bits, -bits), axis=1), order, axis=1), axis=1)
+        last_span = np.frexp(covering[:, :-1])[1] - 1
+        run_pixels = np.take_along_axis(span_pixels, last_span, axis=1).astype(view.dtype)
+        view[first:last] = np.repeat(run_pixels.ravel(), np.diff(cuts, axis=1).ravel()).reshape(rows, width)
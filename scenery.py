@@ -0,0 +1,75 @@
+import numpy as np
+from constants import (OBJ_TREE, OBJ_BILLBOARD, OBJ_SIGN, SCENERY_TREE_CHANCE, SCENERY_TREE_OFFSETS,
+                       SCENERY_BILLBOARD_SPACING, SCENERY_BILLBOARD_OFFSET, SCENERY_SIGN_SPACING, SCENERY_SIGN_OFFSET)
+
+# Roadside objects, listed per segment ahead of time
+#
+# Objects are stored as parallel arrays sorted by segment, and segment_start holds where each
+# segment's objects begin, so the scenery of any window of segments is one contiguous range (two
+# when the window wraps around the end of the track). Trees and billboards are scattered from the
+# seed. Curve signs get slots at a regular spacing and only show where the road bends (chosen
+# when drawing, so they also follow roads streamed in while driving).
+class Scenery:
+    def __init__(self):
+        self.total_segments = 0
+
+        # Segment, type, sheet frame and distance across the road (in road half-widths, negative
+        # on the left; signs are moved to the outside of the bend) of each object
+        self.segment = np.zeros(0, dtype=np.int64)
+        self.type = np.zeros(0, dtype=np.int8)
+        self.frame = np.zeros(0, dtype=np.int8)
+        self.offset = np.zeros(0, dtype=np.float64)
+
+        # First object of every segment (the last entry is the number of objects)
+        self.segment_start = np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.segment)
+
+    def place(self, total_segments, seed=None):
+        """Scatters the scenery along a road of total_segments segments"""
+        rng = np.random.default_rng(seed)
+        segments, types, frames, offsets = [], [], [], []
+
+        def add(segment, obj_type, frame, offset):
+            segments.append(segment)
+            types.append(np.full(len(segment), obj_type, dtype=np.int8))
+            frames.append(np.broadcast_to(frame, len(segment)).astype(np.int8))
+            offsets.append(np.broadcast_to(offset, len(segment)).astype(np.float64))
+
+        # Trees on both sides, at random distances
+        for side in (-1, 1):
+            segment = np.flatnonzero(rng.random(total_segments) < SCENERY_TREE_CHANCE)
+            add(segment, OBJ_TREE, rng.integers(0, 2, len(segment)),
+                side * rng.uniform(*SCENERY_TREE_OFFSETS, len(segment)))
+
+        # Billboards on a random side
+        segment = np.arange(SCENERY_BILLBOARD_SPACING // 2, total_segments, SCENERY_BILLBOARD_SPACING)
+        add(segment, OBJ_BILLBOARD, rng.integers(0, 2, len(segment)),
+            rng.choice((-1, 1), len(segment)) * SCENERY_BILLBOARD_OFFSET)
+
+        # Curve sign slots
+        add(np.arange(0, total_segments, SCENERY_SIGN_SPACING), OBJ_SIGN, 0, SCENERY_SIGN_OFFSET)
+
+        segment = np.concatenate(segments)
+        order = np.argsort(segment, kind='stable')
+        self.total_segments = total_segments
+        self.segment = segment[order]
+        self.type = np.concatenate(types)[order]
+        self.frame = np.concatenate(frames)[order]
+        self.offset = np.concatenate(offsets)[order]
+        self.segment_start = np.searchsorted(self.segment, np.arange(total_segments + 1))
+
+    def in_segments(self, first_segment, count):
+        """Returns the numbers of the objects in a window of count segments, wrapping at the end of the track"""
+        first_segment %= self.total_segments
+        count = min(count, self.total_segments)
+        last_segment = first_segment + count
+        starts = self.segment_start
+
+        if last_segment <= self.total_segments:
+            return np.arange(starts[first_segment], starts[last_segment])
+
+        # The window loops back to the start of the track
+        return np.concatenate((np.arange(starts[first_segment], starts[self.total_segments]),
+                               np.arange(starts[0], starts[last_segment - self.total_segments])))
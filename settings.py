@@ -1,10 +1,14 @@
 import pygame
-from constants import SCREEN_CX, SCREEN_CY, SCREEN_WIDTH, SCREEN_HEIGHT
+from collections import OrderedDict
+from constants import SCREEN_CX, SCREEN_CY, SCREEN_WIDTH, SCREEN_HEIGHT, TEXT_CACHE_SIZE
 
 class Settings:
-    def __init__(self, screen):
+    def __init__(self, screen, dirty=None):
         self.screen = screen
+        self.dirty = dirty  # DirtyRects tracker that records what is drawn (optional)
+        self.countdown_rect = None
         self.font = pygame.font.SysFont(None, 36)
+        self.small_font = pygame.font.SysFont(None, 24)
         self.score = 0
         self.time = 0
         self.start_time = 0
@@ -12,51 +16,123 @@ class Settings:
         self.game_over = False
         self.won = False
 
-    def update_time(self, start_time):
+        # Rendered text surfaces keyed by (text, color, font), least recently used first
+        self.text_cache = OrderedDict()
+        self.text_cache_size = TEXT_CACHE_SIZE
+
+        # Score line as (glyph, position) blits, rebuilt only when the score or time changes
+        self.score_key = None
+        self.score_blits = []
+        self.score_rect = None
+
+    def render_text(self, text, color, font=None):
+        """Return the rendered surface for a text, rendering it only once."""
+        font = font or self.font
+        key = (text, color, font)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.text_cache[key] = surface
+            if len(self.text_cache) > self.text_cache_size:
+                self.text_cache.popitem(last=False)
+        else:
+            self.text_cache.move_to_end(key)
+        return surface
+
+    def draw(self, surface, dest):
+        """Blit a surface to the screen and register the changed area."""
+        rect = self.screen.blit(surface, dest)
+        if self.dirty is not None:
+            self.dirty.add(rect)
+        return rect
+
+    def clear(self, rect):
+        """Clear an area of the screen to black and register it."""
+        self.screen.fill((0, 0, 0), rect)
+        if self.dirty is not None:
+            self.dirty.add(rect)
+
+    def update_time(self, elapsed):
         """Update the elapsed time in seconds."""
-        self.time = (pygame.time.get_ticks() - start_time) // 1000
+        self.time = int(elapsed)
 
     def show_score(self):
         """Display the current score and elapsed time on the screen."""
-        score_text = self.font.render(f"Score: {self.score} Time: {self.time}s", True, (255, 255, 255))
-        self.screen.blit(score_text, (10, 10))
+        key = (self.score, self.time)
+        if key != self.score_key:
+            self.score_key = key
+            self.layout_score()
+
+        self.screen.blits(self.score_blits, doreturn=False)
+        if self.dirty is not None:
+            self.dirty.add(self.score_rect)
+
+    def layout_score(self):
+        """Assemble the score line from cached labels and per-digit glyphs."""
+        white = (255, 255, 255)
+        parts = ["Score: ", *str(self.score), " Time: ", *str(self.time), "s"]
+
+        x, y = 10, 10
+        self.score_blits = []
+        for part in parts:
+            glyph = self.render_text(part, white)
+            self.score_blits.append((glyph, (x, y)))
+            x += glyph.get_width()
+        self.score_rect = pygame.Rect(10, y, x - 10, self.font.get_linesize())
+
+    def show_quality(self, level, description):
+        """Display the rendering quality level below the score line."""
+        text = self.render_text(f"Quality {level}: {description}", (255, 255, 255), self.small_font)
+        self.draw(text, (10, 10 + self.font.get_linesize()))
 
     def show_pause(self):
         """Display the pause message on the screen."""
-        pause_text = self.font.render("PAUSED", True, (255, 255, 255))
+        pause_text = self.render_text("PAUSED", (255, 255, 255))
         text_rect = pause_text.get_rect(center=(SCREEN_CX, SCREEN_CY))
-        self.screen.blit(pause_text, text_rect)
+        self.draw(pause_text, text_rect)
 
     def show_game_over(self):
         """Display the game over message on the screen."""
-        game_over_text = self.font.render("GAME OVER", True, (255, 0, 0))
+        game_over_text = self.render_text("GAME OVER", (255, 0, 0))
         text_rect = game_over_text.get_rect(center=(SCREEN_CX, SCREEN_CY))
-        self.screen.blit(game_over_text, text_rect)
+        self.draw(game_over_text, text_rect)
 
     def show_win(self):
         """Display the win message on the screen."""
-        win_text = self.font.render("YOU WON!", True, (0, 255, 0))
+        win_text = self.render_text("YOU WON!", (0, 255, 0))
         text_rect = win_text.get_rect(center=(SCREEN_CX, SCREEN_CY))
-        self.screen.blit(win_text, text_rect)
+        self.draw(win_text, text_rect)
 
     def show_level_selection(self, options, selected):
         """Display the level selection menu on the screen."""
         self.screen.fill((0, 0, 0))  # Clear the screen
-        title_text = self.font.render("Select Level", True, (255, 255, 255))
+        if self.dirty is not None:
+            self.dirty.invalidate()
+        title_text = self.render_text("Select Level", (255, 255, 255))
         title_rect = title_text.get_rect(center=(SCREEN_CX, SCREEN_CY - 100))
         self.screen.blit(title_text, title_rect)
 
-        for i, level in enumerate(options):
-            color = (255, 255, 255) if i == selected else (128, 128, 128)
-            level_text = self.font.render(level, True, color)
-            level_rect = level_text.get_rect(center=(SCREEN_CX, SCREEN_CY + i * 50))
-            self.screen.blit(level_text, level_rect)
+        for i in range(len(options)):
+            self.show_level_option(options, i, selected)
+
+    def show_level_option(self, options, i, selected):
+        """Redraw one entry of the level selection menu."""
+        color = (255, 255, 255) if i == selected else (128, 128, 128)
+        level_text = self.render_text(options[i], color)
+        level_rect = level_text.get_rect(center=(SCREEN_CX, SCREEN_CY + i * 50))
+        self.clear(level_rect)
+        self.draw(level_text, level_rect)
 
     def show_countdown(self, count):
         """Display a countdown before the game starts."""
-        count_text = self.font.render(str(count), True, (255, 255, 255))
+        count_text = self.render_text(str(count), (255, 255, 255))
         text_rect = count_text.get_rect(center=(SCREEN_CX, SCREEN_CY))
-        self.screen.blit(count_text, text_rect)
+
+        # Erase the previous number
+        if self.countdown_rect is not None:
+            self.clear(self.countdown_rect)
+        self.countdown_rect = text_rect
+        self.draw(count_text, text_rect)
 
     def reset(self):
         """Reset all settings for a new game."""
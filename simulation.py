@@ -0,0 +1,376 @@
+# simulation.py
+# Game state and fixed-step game logic, without pygame.
+#
+# CircuitState holds the road and the cars on it, PlayerState the player's car physics, and
+# Simulation steps them with one input bit mask per SIM_DT step, detecting collisions and the win
+# time. The game draws them through the Circuit and Player subclasses; tools and tests can build
+# and step them on their own, with no display, thousands of steps a second.
+#
+#   sim = create_simulation(LEVELS['hard'], seed=1)
+#   outcome = sim.run(ScriptedInput(DRIVING_SCRIPT))
+import random
+import numpy as np
+from constants import (SEGMENT_LENGTH, VISIBLE_SEGMENTS, RUMBLE_SEGMENTS, ROAD_LANES, ROAD_WIDTH, TRACK_PATH,
+                       TRACK_STREAM_MARGIN, SIM_DT, WIN_TIME, OBJ_CAR, OBJ_TRUCK, CAR_WIDTH, CAR_LENGTH)
+from obstacles import Obstacles
+from track import load_track, StreamedTrack
+
+# Driving input bits
+INPUT_UP = 1
+INPUT_DOWN = 2
+INPUT_LEFT = 4
+INPUT_RIGHT = 8
+
+# Level definitions
+class Level:
+    def __init__(self, name, speed, obstacle_density, view_distance=VISIBLE_SEGMENTS):
+        self.name = name
+        self.speed = speed
+        self.obstacle_density = obstacle_density
+        self.view_distance = view_distance  # Segments drawn ahead of the camera
+
+LEVELS = {
+    'easy': Level('Easy', 500, 10),
+    'medium': Level('Medium', 1000, 20, 250),
+    'hard': Level('Hard', 1500, 30, 300)
+}
+
+class InputProvider:
+    """Source of the driving input, asked once per simulation step"""
+    def next(self):
+        """Returns the input bit mask for the next step"""
+        return 0
+
+class ScriptedInput(InputProvider):
+    """Plays back a list of (steps, input mask) entries, looping when the script ends"""
+    def __init__(self, script):
+        self.steps = list(script)
+        self.step = 0
+        self.frame = 0
+
+    def next(self):
+        frames, mask = self.steps[self.step]
+        self.frame += 1
+        if self.frame >= frames:
+            self.frame = 0
+            self.step = (self.step + 1) % len(self.steps)
+        return mask
+
+class ProgrammaticInput(InputProvider):
+    """Input set by code between steps (bots, tests)"""
+    def __init__(self, mask=0):
+        self.mask = mask
+
+    def set(self, up=False, down=False, left=False, right=False):
+        """Holds the given inputs until the next set"""
+        self.mask = ((INPUT_UP if up else 0) | (INPUT_DOWN if down else 0) |
+                     (INPUT_LEFT if left else 0) | (INPUT_RIGHT if right else 0))
+
+    def next(self):
+        return self.mask
+
+# Default benchmark drive: accelerate, then weave across the lanes at full speed
+DRIVING_SCRIPT = [
+    (120, INPUT_UP),
+    (30, INPUT_UP | INPUT_LEFT),
+    (60, INPUT_UP),
+    (60, INPUT_UP | INPUT_RIGHT),
+    (60, INPUT_UP),
+    (30, INPUT_UP | INPUT_LEFT),
+    (30, INPUT_DOWN)
+]
+
+# Road and the cars on it
+class CircuitState:
+    def __init__(self):
+        # Road segments, stored as parallel arrays indexed by segment number (mapped from the
+        # track file by create): sideways bend, height of the near edge and color
+        self.track = None
+        self.curve = np.zeros(0, dtype=np.float32)
+        self.world_y = np.zeros(0, dtype=np.float32)
+        self.color_index = np.zeros(0, dtype=np.uint8)
+
+        # Segment length and road parameters
+        self.segment_length = SEGMENT_LENGTH
+        self.total_segments = None
+        self.visible_segments = VISIBLE_SEGMENTS
+        self.rumble_segments = RUMBLE_SEGMENTS
+        self.road_lanes = ROAD_LANES
+        self.road_width = ROAD_WIDTH
+        self.road_length = None
+
+        # Obstacles (only cars)
+        self.obstacles = Obstacles()
+        self.obstacle_density = 15  # Default, will be overridden by level
+
+        # Random generator for obstacle placement (seeded for reproducible runs)
+        self.seed = None
+        self.rng = random.Random()
+
+    def create(self, track_path=TRACK_PATH, endless=False):
+        """Loads the road from a track file (or a track description, compiled on first use)
+
+        With endless set, the road is instead generated from the seed while driving.
+        """
+        if endless:
+            self.track = StreamedTrack(self.seed, self.visible_segments + 2 * TRACK_STREAM_MARGIN, TRACK_STREAM_MARGIN)
+        else:
+            self.track = load_track(track_path)
+        self.curve = self.track.curve
+        self.world_y = self.track.world_y
+        self.color_index = self.track.color_index
+        self.segment_length = self.track.segment_length
+        self.rumble_segments = self.track.rumble_segments
+
+        # Store the total number of segments
+        self.total_segments = self.track.total_segments
+
+        # Calculate the road length
+        self.road_length = self.total_segments * self.segment_length
+
+    def height_at(self, position_z):
+        """Returns the road height at the given Z position"""
+        segment = int(position_z / self.segment_length) % self.total_segments
+        percent = position_z / self.segment_length % 1
+        y1 = float(self.world_y[segment])
+        y2 = float(self.world_y[(segment + 1) % self.total_segments])
+        return y1 + (y2 - y1) * percent
+
+    def create_obstacles(self):
+        """Create obstacles (cars) that are clearly visible"""
+        self.rng.seed(self.seed)
+        positions, lanes, speeds, types = [], [], [], []
+
+        # Leave the first 20% of the track clear for the player
+        safe_zone = self.total_segments * 0.2
+        remaining_track = self.total_segments - safe_zone
+
+        # Calculate number of cars based on density
+        num_cars = int(self.total_segments * (self.obstacle_density / 100))
+
+        # Place cars at regular intervals with some randomness
+        for i in range(num_cars):
+            # Calculate a position that ensures cars are spread out
+            position_percent = (i / num_cars) * 0.8  # Use 80% of the remaining track
+            segment_index = int(safe_zone + (remaining_track * position_percent))
+
+            # Add some randomness to the position
+            segment_index += self.rng.randint(-5, 5)
+
+            # Ensure segment_index is within valid range
+            segment_index = max(int(safe_zone), min(segment_index, self.total_segments - 1))
+
+            # Determine car type (75% regular cars, 25% trucks)
+            obj_type = OBJ_CAR if self.rng.random() > 0.25 else OBJ_TRUCK
+
+            # Assign to a lane (-1: left, 0: center, 1: right)
+            lane = self.rng.randint(-1, 1)
+
+            # Set speed factor (50-80% of player's speed)
+            speed_factor = self.rng.uniform(0.5, 0.8)
+
+            # Add car
+            positions.append(segment_index * self.segment_length)
+            lanes.append(lane)
+            speeds.append(speed_factor)
+            types.append(obj_type)
+
+        self.obstacles.place(positions, lanes, speeds, types, self.segment_length, self.total_segments, self.seed)
+
+    def update_road(self, player_z):
+        """Streams in the road ahead of the player (endless tracks only)"""
+        self.track.advance(self.get_segment_index(player_z))
+
+    def update_obstacles(self, player_z, dt, player_speed):
+        """Drive all obstacles: car-following, lane changes and positions"""
+        self.obstacles.update(player_z, dt, player_speed, self.visible_segments)
+
+    def get_segment_index(self, position_z):
+        """Returns the number of the segment at the given Z position"""
+        if position_z < 0:
+            position_z += self.road_length
+        return int(position_z / self.segment_length) % self.total_segments
+
+# Player's car
+class PlayerState:
+    def __init__(self):
+        # Player world coordinates (x is normalized between -1 and 1)
+        self.x = 0  # Position on road (0 = center)
+        self.y = 0
+        self.z = 0
+
+        # Position before the last simulation step (for interpolated rendering)
+        self.prev_x = 0
+        self.prev_z = 0
+
+        # Distance driven (z wraps around the circuit)
+        self.distance = 0
+
+        # Driving parameters
+        self.speed = 0
+        self.max_speed = 1000  # Default speed (will be adjusted based on level)
+        self.acceleration = 0.1
+        self.deceleration = 0.3
+        self.turning_speed = 3.0
+        self.centrifugal_force = 0.3
+
+        # Collision detection
+        self.width = CAR_WIDTH  # Width of the car (normalized)
+
+        # Narrow phase run on the cars the broad phase finds (collision.MaskCollider), or None to
+        # count every car whose box overlaps the player's
+        self.collider = None
+
+    def restart(self):
+        """Reset player for a new game"""
+        self.x = 0
+        self.y = 0
+        self.z = 0
+        self.distance = 0
+        self.speed = self.max_speed / 2  # Start at half max speed
+
+    def update(self, dt, circuit, mask=0):
+        """Update player position based on an input bit mask and physics"""
+        self.prev_x = self.x
+        self.prev_z = self.z
+
+        # Accelerate/decelerate
+        if mask & INPUT_UP:
+            self.speed += self.acceleration * self.max_speed * dt
+        elif mask & INPUT_DOWN:
+            self.speed -= self.deceleration * self.max_speed * dt
+
+        # Limit speed
+        self.speed = max(0, min(self.speed, self.max_speed))
+
+        # Steering left/right
+        if mask & INPUT_LEFT:
+            self.x -= dt * self.turning_speed * (self.speed / self.max_speed)
+        elif mask & INPUT_RIGHT:
+            self.x += dt * self.turning_speed * (self.speed / self.max_speed)
+
+        # Curves push the car towards the outside of the bend
+        curve = float(circuit.curve[circuit.get_segment_index(self.z)])
+        speed_percent = self.speed / self.max_speed
+        self.x -= dt * self.turning_speed * speed_percent * speed_percent * curve * self.centrifugal_force
+
+        # Limit player x position to stay on the road
+        self.x = max(-1, min(1, self.x))
+
+        # Update z position based on speed
+        self.z += self.speed * dt
+        self.distance += self.speed * dt
+
+        # Keep within the circuit length
+        if self.z >= circuit.road_length:
+            self.z -= circuit.road_length
+
+    def interpolate(self, alpha, road_length):
+        """Returns the (x, z) position a fraction alpha of the way through the last simulation step"""
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+
+        # Interpolate z forward across the end of the circuit
+        z = self.prev_z + ((self.z - self.prev_z) % road_length) * alpha
+        if z >= road_length:
+            z -= road_length
+        return x, z
+
+    def check_collision(self, circuit):
+        """Check for collisions with cars"""
+        cars = circuit.obstacles
+        road_length = circuit.road_length
+
+        # Broad phase: cars in the segments around the player (wrapping around the end of the
+        # track) whose boxes overlap the player's car along and across the road
+        span = int(CAR_LENGTH // circuit.segment_length) + 1
+        candidates = cars.in_segments(circuit.get_segment_index(self.z) - span, 2 * span + 1)
+        dz = (cars.z[candidates] - self.z + road_length / 2) % road_length - road_length / 2
+        dx = cars.x[candidates] - self.x
+        near = (np.abs(dz) < CAR_LENGTH) & (np.abs(dx) < (self.width + CAR_WIDTH) / 2)
+        if not near.any():
+            return False
+
+        # Narrow phase: sprite pixels
+        if self.collider is None:
+            return True
+        return self.collider.collide(self, circuit, dz[near], dx[near], cars.type[candidates[near]])
+
+# Fixed-step game logic
+#
+# One step moves the player, streams the road, moves the cars and checks for a collision, then
+# the run is over on a collision or once WIN_TIME of simulated time has passed without one. The
+# game loop, replays, tools and tests all run these same steps; the game times their parts by
+# passing its frame profiler as the lap hook.
+class Simulation:
+    def __init__(self, circuit, player, lap=None):
+        self.circuit = circuit
+        self.player = player
+
+        # Called with 'player', 'obstacles' and 'collision' after each part of a step, if set
+        self.lap = lap
+
+        # Steps run, and how the run ended
+        self.ticks = 0
+        self.collided = False
+        self.won = False
+
+    def elapsed(self):
+        """Returns the simulated play time in seconds"""
+        return self.ticks * SIM_DT
+
+    def finished(self):
+        """Returns whether the player collided or won"""
+        return self.collided or self.won
+
+    def outcome(self):
+        """Returns 'collision', 'won' or 'running'"""
+        if self.collided:
+            return 'collision'
+        return 'won' if self.won else 'running'
+
+    def step(self, mask=0):
+        """Advances the game by one SIM_DT step with the given input. Returns True if the player hit a car in this step."""
+        circuit, player, lap = self.circuit, self.player, self.lap
+        player.update(SIM_DT, circuit, mask)
+        circuit.update_road(player.z)
+        if lap is not None:
+            lap('player')
+        circuit.update_obstacles(player.z, SIM_DT, player.max_speed)
+        if lap is not None:
+            lap('obstacles')
+        self.ticks += 1
+
+        collided = player.check_collision(circuit)
+        if lap is not None:
+            lap('collision')
+        if collided:
+            self.collided = True
+        elif self.elapsed() >= WIN_TIME and not self.collided:
+            self.won = True
+        return collided
+
+    def run(self, provider, max_ticks=None):
+        """Steps with input from a provider until the run is over (or max_ticks steps). Returns the outcome."""
+        ticks = 0
+        while not self.finished() and (max_ticks is None or ticks < max_ticks):
+            self.step(provider.next())
+            ticks += 1
+        return self.outcome()
+
+def setup_simulation(circuit, player, level, seed=None, endless=False, track_path=TRACK_PATH):
+    """Configures a circuit and player for a level and creates the road and cars (seed fixes the cars and endless road)"""
+    # Every run gets a seed, so it can be recorded and replayed
+    circuit.seed = seed if seed is not None else random.randrange(2 ** 32)
+
+    # Adjust player speed based on the selected level
+    player.max_speed = level.speed
+    circuit.obstacle_density = level.obstacle_density
+    circuit.visible_segments = level.view_distance
+
+    circuit.create(track_path, endless)  # Create the road first
+    circuit.create_obstacles()  # Then create obstacles
+    return Simulation(circuit, player)
+
+def create_simulation(level, seed=None, endless=False, track_path=TRACK_PATH):
+    """Returns a simulation of a level with no rendering state"""
+    return setup_simulation(CircuitState(), PlayerState(), level, seed, endless, track_path)
@@ -0,0 +1,204 @@
+import math
+from collections import OrderedDict
+import numpy as np
+import pygame
+
+# Cache of pre-scaled sprites
+#
+# Projected scales are quantized to a fixed set of geometric levels between min_scale and
+# max_scale. Each (sprite, level) surface is built the first time it is needed and the least
+# recently used ones are evicted once the cache holds more than max_bytes of pixels.
+class ScaledSpriteCache:
+    def __init__(self, images, levels=96, min_scale=0.1, max_scale=1.0, smooth=False, max_bytes=64 * 1024 * 1024):
+        # Source sprites, keyed by object type
+        self.images = images
+
+        # Scale quantization
+        self.levels = levels
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.log_min = math.log(min_scale)
+        self.level_step = (math.log(max_scale) - self.log_min) / (levels - 1)
+
+        # Scaling quality and memory cap
+        self.smooth = smooth
+        self.max_bytes = max_bytes
+
+        # Scaled surfaces, keyed by (object type, level), least recently used first
+        self.surfaces = OrderedDict()
+        self.bytes = 0
+
+        # Cache statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, scale):
+        """Returns the level closest to the given scale"""
+        scale = min(self.max_scale, max(self.min_scale, scale))
+        return int(round((math.log(scale) - self.log_min) / self.level_step))
+
+    def quantize_array(self, scales):
+        """Returns the levels closest to an array of scales"""
+        scales = np.clip(scales, self.min_scale, self.max_scale)
+        return np.round((np.log(scales) - self.log_min) / self.level_step).astype(np.int64)
+
+    def level_scale(self, level):
+        """Returns the scale of a level"""
+        return math.exp(self.log_min + level * self.level_step)
+
+    def get(self, key, scale):
+        """Returns the sprite scaled to the level closest to scale"""
+        return self.get_level(key, self.quantize(scale))
+
+    def get_level(self, key, level):
+        """Returns the sprite scaled to a level"""
+        cache_key = (key, level)
+        surface = self.surfaces.get(cache_key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(cache_key)
+            return surface
+
+        self.misses += 1
+        surface = self._build(key, level)
+        self.surfaces[cache_key] = surface
+        self.bytes += surface.get_pitch() * surface.get_height()
+
+        # Evict least recently used levels (never the one just built)
+        while self.bytes > self.max_bytes and len(self.surfaces) > 1:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.bytes -= evicted.get_pitch() * evicted.get_height()
+            self.evictions += 1
+
+        return surface
+
+    def _build(self, key, level):
+        """Scales a source sprite to a level"""
+        image = self.images[key]
+        scale = self.level_scale(level)
+        size = (max(1, int(image.get_width() * scale)), max(1, int(image.get_height() * scale)))
+        if self.smooth:
+            return pygame.transform.smoothscale(image, size)
+        return pygame.transform.scale(image, size)
+
+    def set_smooth(self, smooth):
+        """Switches between smoothscale and scale, dropping surfaces built the other way"""
+        if smooth != self.smooth:
+            self.smooth = smooth
+            self.clear()
+
+    def clear(self):
+        """Drops every cached surface"""
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def hit_rate(self):
+        """Returns the fraction of lookups served from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Returns cache hits, misses, evictions and bytes held"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate(),
+            'surfaces': len(self.surfaces),
+            'bytes': self.bytes
+        }
+
+    def summary(self):
+        """Returns a one-line description of the cache state"""
+        return (f"sprites: {len(self.surfaces)} scaled surfaces, {self.bytes / (1024 * 1024):.1f} MiB, "
+                f"{self.hit_rate():.1%} hit rate, {self.evictions} evictions")
+
+def sheet_frames(sheet, count):
+    """Returns the frames of a sprite sheet holding count frames side by side (subsurfaces of it)"""
+    width = sheet.get_width() // count
+    return [sheet.subsurface((i * width, 0, width, sheet.get_height())) for i in range(count)]
+
+# Sprites packed into one surface
+#
+# Every image is trimmed to its bounding box of visible pixels and packed in rows, tallest
+# first, up to `width` pixels wide. The sprites are subsurface regions of the atlas, so they
+# all share its pixels; a sprite's bottom edge is the bottom of its visible pixels.
+class SpriteAtlas:
+    def __init__(self, images, width):
+        trims = [image.get_bounding_rect() for image in images]
+
+        # Shelf packing: fill a row left to right, then start the next below its tallest sprite
+        places = [None] * len(images)
+        x = y = row_height = atlas_width = 0
+        for i in sorted(range(len(images)), key=lambda i: trims[i].height, reverse=True):
+            w, h = trims[i].size
+            if x > 0 and x + w > width:
+                x, y, row_height = 0, y + row_height, 0
+            places[i] = (x, y)
+            x += w
+            row_height = max(row_height, h)
+            atlas_width = max(atlas_width, x)
+
+        # Transparent atlas in the images' pixel format; the maximum blend copies every pixel
+        # exactly, alpha included
+        self.surface = pygame.Surface((max(1, atlas_width), max(1, y + row_height)), pygame.SRCALPHA, images[0])
+        self.surface.fill((0, 0, 0, 0))
+        self.regions = []
+        for image, trim, place in zip(images, trims, places):
+            self.surface.blit(image, place, trim, special_flags=pygame.BLEND_RGBA_MAX)
+            self.regions.append(self.surface.subsurface((place, trim.size)))
+
+    def bytes(self):
+        """Returns the number of pixel bytes of the atlas"""
+        return self.surface.get_pitch() * self.surface.get_height()
+
+# Queue of sprite draws, drawn back to front with one Surface.blits call
+#
+# Every draw fills a record kept from earlier frames ([surface, position, area] lists, which
+# blits takes as they are), so a warmed-up frame allocates nothing per sprite. Draws are ordered
+# by depth with a stable sort, which is adaptive: submitted roughly in depth order (as the road's
+# segments come), they are sorted in close to linear time.
+class RenderQueue:
+    def __init__(self, capacity=64):
+        self.records = []
+        self.areas = []
+        self.depth = np.zeros(0, dtype=np.float64)
+        self.count = 0
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        """Adds records up to the given capacity"""
+        for _ in range(len(self.records), capacity):
+            self.records.append([None, [0, 0], None])
+            self.areas.append(pygame.Rect(0, 0, 0, 0))
+        depth = np.zeros(capacity, dtype=np.float64)
+        depth[:self.count] = self.depth[:self.count]
+        self.depth = depth
+
+    def add(self, surface, x, y, depth, height=None):
+        """Queues a sprite drawn at (x, y), depth world units from the camera, cut off after height rows if given"""
+        if self.count == len(self.records):
+            self.grow(2 * self.count)
+        record = self.records[self.count]
+        record[0] = surface
+        position = record[1]
+        position[0] = x
+        position[1] = y
+        if height is None:
+            record[2] = None
+        else:
+            area = self.areas[self.count]
+            area.size = (surface.get_width(), height)
+            record[2] = area
+        self.depth[self.count] = depth
+        self.count += 1
+
+    def draw(self, screen):
+        """Draws the queued sprites from the farthest to the nearest and empties the queue"""
+        if self.count == 0:
+            return
+        order = np.argsort(-self.depth[:self.count], kind='stable')
+        records = self.records
+        screen.blits([records[i] for i in order.tolist()], doreturn=False)
+        self.count = 0
@@ -0,0 +1,180 @@
+# sweep.py
+# Monte Carlo difficulty sweep for level tuning: plays many seeded headless games with a bot
+# driver for every speed/density pair of a grid, on all cores, and reports the distribution of
+# survival time, collisions per kilometer and score of each pair.
+#
+# Every game is written to a JSON Lines file as soon as it finishes, so a sweep never holds its
+# results in memory and an interrupted sweep keeps the games already played.
+#
+#   python sweep.py --speeds 500 1000 1500 --densities 10 20 30 --runs 200 --output sweep.jsonl
+#   python sweep.py --report sweep.jsonl --summary sweep_summary.json
+import os
+import argparse
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from constants import SIM_HZ, TRACK_PATH, WIN_TIME, WORLD_UNITS_PER_KM
+from simulation import Level, create_simulation
+from track import load_track
+from bots import BOTS, create_bot
+from collision import MaskCollider
+
+# Games queued per worker, enough to keep every core busy without queueing the whole sweep
+QUEUED_PER_WORKER = 4
+
+# Collision masks of the worker process, built by its first game
+collider = None
+
+def play(task):
+    """Plays one game for a task and returns its result"""
+    global collider
+    if collider is None:
+        collider = MaskCollider.load()
+
+    simulation = create_simulation(Level('sweep', task['speed'], task['density']), task['seed'], task['endless'])
+    simulation.player.collider = collider
+    driver = create_bot(task['bot'], simulation, task['seed'])
+
+    # Play on through collisions for the whole time, counting every car hit once
+    collisions = 0
+    touching = False
+    survival = None
+    score_distance = None
+    for _ in range(int(task['seconds'] * SIM_HZ)):
+        hit = simulation.step(driver.next())
+        if hit and not touching:
+            collisions += 1
+            if survival is None:
+                # Where the game would have ended
+                survival = simulation.elapsed()
+                score_distance = simulation.player.distance
+        touching = hit
+
+    distance = simulation.player.distance
+    km = distance / WORLD_UNITS_PER_KM
+    return dict(task,
+                crashed=survival is not None,
+                survival=survival if survival is not None else simulation.elapsed(),
+                collisions=collisions,
+                distance=distance,
+                collisions_per_km=collisions / km if km > 0 else 0.0,
+                score=int((score_distance if score_distance is not None else distance) / 100))
+
+def sweep_tasks(speeds, densities, runs, bot, seed=0, seconds=WIN_TIME, endless=False):
+    """Yields the games of a sweep (every pair plays the same seeds, so pairs differ only in their settings)"""
+    for speed, density in itertools.product(speeds, densities):
+        for run in range(runs):
+            yield {'bot': bot, 'speed': speed, 'density': density, 'seed': seed + run,
+                   'seconds': seconds, 'endless': endless}
+
+def run_sweep(tasks, path, workers=None, progress=True):
+    """Plays tasks across a process pool, appending each result to a JSON Lines file. Returns the games played."""
+    workers = workers or os.cpu_count() or 1
+
+    # Compile the track once up front, rather than in every worker at the same time
+    load_track(TRACK_PATH)
+
+    played = 0
+    begin = time.perf_counter()
+    with open(path, 'w') as f, ProcessPoolExecutor(workers) as pool:
+        def write(done):
+            nonlocal played
+            for future in done:
+                f.write(json.dumps(future.result()) + '\n')
+                played += 1
+            f.flush()
+            if progress:
+                rate = played / (time.perf_counter() - begin)
+                print(f"\r{played} games ({rate:.1f}/s)", end='', flush=True)
+
+        pending = set()
+        for task in tasks:
+            if len(pending) >= workers * QUEUED_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(done)
+            pending.add(pool.submit(play, task))
+        write(wait(pending).done)
+
+    if progress:
+        print()
+    return played
+
+def distribution(values):
+    """Returns the mean and 10th, 50th and 90th percentiles of a list of values"""
+    values = np.asarray(values, dtype=np.float64)
+    p10, p50, p90 = np.percentile(values, (10, 50, 90))
+    return {'mean': float(values.mean()), 'p10': float(p10), 'p50': float(p50), 'p90': float(p90)}
+
+def summarize(path):
+    """Reads a sweep's results and returns the distributions of every (bot, speed, density) configuration"""
+    configs = {}
+    with open(path) as f:
+        for line in f:
+            game = json.loads(line)
+            key = (game['bot'], game['speed'], game['density'])
+            config = configs.setdefault(key, {'survival': [], 'collisions_per_km': [], 'score': [], 'crashed': 0})
+            config['survival'].append(game['survival'])
+            config['collisions_per_km'].append(game['collisions_per_km'])
+            config['score'].append(game['score'])
+            config['crashed'] += game['crashed']
+
+    summary = []
+    for (bot, speed, density), config in sorted(configs.items()):
+        runs = len(config['survival'])
+        summary.append({
+            'bot': bot,
+            'speed': speed,
+            'density': density,
+            'runs': runs,
+            'crash_rate': config['crashed'] / runs,
+            'survival': distribution(config['survival']),
+            'collisions_per_km': distribution(config['collisions_per_km']),
+            'score': distribution(config['score'])
+        })
+    return summary
+
+def print_summary(summary):
+    """Prints one line per configuration"""
+    print(f"{'bot':>6} {'speed':>6} {'density':>7} {'runs':>5} {'crash':>6}  "
+          f"{'survival s p10/p50/p90':>24}  {'hits/km mean/p90':>17}  {'score p10/p50/p90':>20}")
+    for config in summary:
+        survival, hits, score = config['survival'], config['collisions_per_km'], config['score']
+        print(f"{config['bot']:>6} {config['speed']:>6} {config['density']:>7g} {config['runs']:>5} "
+              f"{config['crash_rate']:>6.0%}  "
+              f"{survival['p10']:>8.1f}{survival['p50']:>8.1f}{survival['p90']:>8.1f}  "
+              f"{hits['mean']:>8.2f}{hits['p90']:>9.2f}  "
+              f"{score['p10']:>6.0f}{score['p50']:>7.0f}{score['p90']:>7.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo difficulty sweep over level speed and obstacle density")
+    parser.add_argument('--speeds', type=int, nargs='+', default=[500, 1000, 1500], help="player top speeds")
+    parser.add_argument('--densities', type=float, nargs='+', default=[10, 20, 30],
+                        help="obstacle densities (cars per 100 segments)")
+    parser.add_argument('--runs', type=int, default=100, help="games per speed/density pair")
+    parser.add_argument('--bot', choices=list(BOTS), default='avoid', help="driver")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game of every pair")
+    parser.add_argument('--seconds', type=float, default=WIN_TIME, help="simulated seconds per game")
+    parser.add_argument('--endless', action='store_true', help="drive endless roads generated from the seeds")
+    parser.add_argument('--workers', type=int, help="worker processes (default: every core)")
+    parser.add_argument('--output', default='sweep.jsonl', help="JSON Lines file the games are written to")
+    parser.add_argument('--report', metavar='PATH', help="only summarize an existing results file")
+    parser.add_argument('--summary', metavar='PATH', help="also write the summary to a JSON file")
+    args = parser.parse_args()
+
+    path = args.report
+    if path is None:
+        path = args.output
+        tasks = sweep_tasks(args.speeds, args.densities, args.runs, args.bot, args.seed, args.seconds, args.endless)
+        played = run_sweep(tasks, path, args.workers)
+        print(f"{played} games written to {path}")
+
+    summary = summarize(path)
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import pytest
+from main import setup_game
+from replay import InputRecorder, InputReplay, MAX_RUN, replay
+from simulation import LEVELS, Simulation, ScriptedInput, DRIVING_SCRIPT
+
+@pytest.mark.parametrize('level, seed, endless', [('hard', 1, False), ('medium', 2, False), ('hard', 4, True)])
+def test_recorded_run_replays_the_same(assets, tmp_path, level, seed, endless):
+    # Record a run the way the game loop does, with the display's sprites for collisions
+    circuit, camera, player = setup_game(assets, LEVELS[level], seed, endless)
+    simulation = Simulation(circuit, player)
+    recorder = InputRecorder(circuit.seed, level, endless)
+    driver = ScriptedInput(DRIVING_SCRIPT)
+    while not simulation.finished():
+        mask = driver.next()
+        recorder.record(mask)
+        simulation.step(mask)
+    path = tmp_path / 'run.rpl'
+    recorder.save(path)
+
+    # Replay it headless, with the collision masks loaded without a display
+    summary = replay(path)
+    assert summary['ticks'] == simulation.ticks
+    assert summary['outcome'] == simulation.outcome()
+    assert summary['player_z'] == player.z
+    assert summary['distance'] == player.distance
+
+def test_save_and_load(tmp_path):
+    recorder = InputRecorder(2 ** 40 + 5, 'medium', endless=True)
+    masks = [0] * (MAX_RUN + 10) + [1, 1, 5, 2] * 3
+    for mask in masks:
+        recorder.record(mask)
+    path = tmp_path / 'run.rpl'
+    recorder.save(path)
+
+    recording = InputReplay.load(path)
+    assert (recording.seed, recording.level_name, recording.endless) == (2 ** 40 + 5, 'medium', True)
+    assert recording.ticks() == len(masks)
+    assert [recording.next() for _ in masks] == masks
+    assert recording.next() == 0
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'run.rpl'
+    path.write_bytes(b'not a recording at all')
+    with pytest.raises(ValueError):
+        InputReplay.load(path)
@@ -0,0 +1,96 @@
+import warnings
+import numpy as np
+import pygame
+import pytest
+from main import setup_game
+from simulation import LEVELS, Simulation, ScriptedInput, DRIVING_SCRIPT
+
+def drawn_windows(assets, level, seed, endless, steps=900, every=15):
+    """Drives a scripted run and yields the circuit with every few steps' view projected and clipped"""
+    view_size = pygame.display.get_surface().get_size()
+    circuit, camera, player = setup_game(assets, level, seed, endless)
+    simulation = Simulation(circuit, player)
+    driver = ScriptedInput(DRIVING_SCRIPT)
+    for step in range(steps):
+        simulation.step(driver.next())
+        if step % every:
+            continue
+        camera.follow(player.x, player.z, circuit)
+        circuit.view_width, circuit.view_height = view_size
+        index = circuit.project_segments(camera, circuit.get_segment_index(camera.z))
+        drawn = circuit.clip_segments()
+        yield circuit, drawn, circuit.color_index[index]
+
+def noise_background(seed):
+    """Returns a display-sized surface of noise, which shows pixels drawn that should not have been"""
+    rng = np.random.default_rng(seed)
+    view_size = pygame.display.get_surface().get_size()
+    background = pygame.Surface(view_size).convert()
+    pygame.surfarray.pixels2d(background)[:] = rng.integers(0, 2 ** 24, view_size, dtype=np.uint32)
+    return background
+
+def assert_same_pixels(first, second):
+    assert (pygame.surfarray.array2d(first) == pygame.surfarray.array2d(second)).all()
+
+@pytest.mark.parametrize('level, seed, endless', [('easy', 1, False), ('hard', 1, False), ('easy', 3, True)])
+def test_banded_matches_segments(assets, level, seed, endless):
+    background = noise_background(seed)
+    for circuit, drawn, colors in drawn_windows(assets, LEVELS[level], seed, endless):
+        segments = background.copy()
+        banded = background.copy()
+        circuit.render_segments(segments, drawn, colors)
+        circuit.render_banded(banded, drawn, colors)
+        assert_same_pixels(segments, banded)
+
+def test_banded_matches_segments_below_the_near_edge(assets):
+    # A window whose first drawn segment reaches down below its near edge instead of stepping up
+    circuit, drawn, colors = next(drawn_windows(assets, LEVELS['easy'], 1, False, steps=1))
+    circuit.screen_y[drawn[0] - 1] = circuit.screen_y[drawn[0]] - 40
+
+    background = noise_background(1)
+    segments = background.copy()
+    banded = background.copy()
+    circuit.render_segments(segments, drawn, colors)
+    circuit.render_banded(banded, drawn, colors)
+    assert_same_pixels(segments, banded)
+
+def full_detail(circuit):
+    """Turns off the batcher's level of detail, so it draws what render_segments draws"""
+    circuit.road_batcher.lod_lanes = circuit.visible_segments
+    circuit.road_batcher.lod_rumble = circuit.visible_segments
+    circuit.road_batcher.merge_height = 0
+
+@pytest.mark.parametrize('level, seed, endless', [('easy', 1, False), ('hard', 1, False), ('easy', 3, True)])
+def test_batched_matches_segments(assets, level, seed, endless):
+    background = noise_background(seed)
+    for circuit, drawn, colors in drawn_windows(assets, LEVELS[level], seed, endless):
+        full_detail(circuit)
+        segments = background.copy()
+        batched = background.copy()
+        circuit.render_segments(segments, drawn, colors)
+        circuit.road_batcher.draw(batched, circuit.screen_x, circuit.screen_y, circuit.screen_w, drawn, colors,
+                                  circuit.palette)
+        assert_same_pixels(segments, batched)
+
+def test_batched_matches_segments_below_the_near_edge(assets):
+    circuit, drawn, colors = next(drawn_windows(assets, LEVELS['easy'], 1, False, steps=1))
+    full_detail(circuit)
+    circuit.screen_y[drawn[0] - 1] = circuit.screen_y[drawn[0]] - 40
+
+    background = noise_background(1)
+    segments = background.copy()
+    batched = background.copy()
+    circuit.render_segments(segments, drawn, colors)
+    circuit.road_batcher.draw(batched, circuit.screen_x, circuit.screen_y, circuit.screen_w, drawn, colors,
+                              circuit.palette)
+    assert_same_pixels(segments, batched)
+
+def test_points_just_in_front_of_the_camera_project_in_range(assets):
+    circuit = next(drawn_windows(assets, LEVELS['easy'], 1, False, steps=1))[0]
+    trans = np.array([-1000.0, 1000.0])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        screen_x, screen_y, screen_w, scale = circuit.project_arrays(trans, trans, np.array([1e-10, 1e-10]), 0.5)
+    assert screen_x[0] < 0 < screen_x[1]
+    assert screen_y[1] < 0 < screen_y[0]
+    assert (screen_w > 0).all()
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+from constants import SIM_HZ, WIN_TIME
+from simulation import (LEVELS, Level, ScriptedInput, ProgrammaticInput, DRIVING_SCRIPT, create_simulation)
+
+def run(level, seed, provider=None):
+    """Runs a level to its end and returns the simulation"""
+    simulation = create_simulation(level, seed)
+    simulation.run(provider or ScriptedInput(DRIVING_SCRIPT))
+    return simulation
+
+def test_imports_without_pygame():
+    code = "import sys, simulation; sys.exit('pygame' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code]).returncode == 0
+
+def test_same_seed_same_run():
+    first = run(LEVELS['hard'], 1)
+    second = run(LEVELS['hard'], 1)
+    assert first.outcome() == second.outcome()
+    assert first.ticks == second.ticks
+    assert first.player.z == second.player.z
+    assert (first.circuit.obstacles.z == second.circuit.obstacles.z).all()
+
+def test_scripted_runs():
+    assert run(LEVELS['hard'], 1).outcome() == 'collision'
+    assert run(LEVELS['easy'], 1).outcome() == 'won'
+
+def test_empty_road_wins_at_win_time():
+    simulation = run(Level('Empty', 500, 0), 1)
+    assert simulation.outcome() == 'won'
+    assert simulation.ticks == round(WIN_TIME * SIM_HZ)
+
+def test_max_ticks():
+    simulation = create_simulation(LEVELS['easy'], 1)
+    assert simulation.run(ProgrammaticInput(), max_ticks=100) == 'running'
+    assert simulation.ticks == 100
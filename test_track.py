@@ -0,0 +1,14 @@
+from track import StreamedTrack
+
+def test_streamed_track_holds_the_road_behind_the_start():
+    track = StreamedTrack(3, 320, 10)
+
+    # The slots behind segment 0 hold a flat, straight lead-in at its height
+    assert (track.world_y[310:] == track.world_y[0]).all()
+    assert (track.curve[310:] == 0).all()
+
+    # Once the player moves on, the lead-in is overwritten with the road that follows
+    track.advance(10)
+    longer = StreamedTrack(3, 640, 10)
+    assert (track.world_y[310:] == longer.world_y[310:320]).all()
+    assert (track.curve[310:] == longer.curve[310:320]).all()
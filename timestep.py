@@ -0,0 +1,28 @@
+from constants import SIM_DT, MAX_SIM_STEPS
+
+# Fixed-step simulation clock
+#
+# Real frame time is added to an accumulator that is spent in whole simulation steps of SIM_DT.
+# The remainder gives how far rendering is between the last two simulation states.
+class FixedTimestep:
+    def __init__(self, step=SIM_DT, max_steps=MAX_SIM_STEPS):
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    def advance(self, dt):
+        """Adds dt seconds of real time and returns the number of simulation steps to run"""
+        self.accumulator += dt
+        steps = int(self.accumulator / self.step)
+
+        # After a long stall drop the backlog instead of spiralling
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = self.step * steps + self.accumulator % self.step
+
+        self.accumulator -= self.step * steps
+        return steps
+
+    def alpha(self):
+        """Returns how far the current frame is into the next simulation step (0 to 1)"""
+        return min(1.0, self.accumulator / self.step)
@@ -0,0 +1,267 @@
+# track.py
+# Track descriptions and the packed binary tracks compiled from them.
+#
+# A description is a JSON file with a list of sections:
+#
+#   {"sections": [{"length": 200}, {"length": 150, "curve": 3, "hill": 2000}, ...]}
+#
+#   length  number of segments
+#   curve   sideways bend per segment at full strength (negative bends left), eased in over the
+#           first quarter of the section and out over the last quarter
+#   hill    height change over the section in world units, eased in and out
+#
+# The compiled file holds one entry per segment in flat arrays, so Circuit maps it into memory
+# and only the pages of segments that are actually looked at are ever read.
+#
+# StreamedTrack is the endless alternative: random sections generated lazily from a seed into a
+# small ring of segments that is rewritten ahead of the player.
+#
+#   python track.py tracks/default.json                     compile to tracks/default.trk
+#   python track.py --random 1000000 -o tracks/long.trk     compile a random million-segment track
+import os
+import argparse
+import json
+import math
+import random
+import struct
+import numpy as np
+from constants import (SEGMENT_LENGTH, RUMBLE_SEGMENTS, COLOR_LIGHT, COLOR_DARK, COLOR_START, COLOR_FINISH,
+                       ENDLESS_MAX_HEIGHT)
+
+# File layout: header, then the curve (float32), world_y (float32) and color_index (uint8) arrays,
+# each starting on an ALIGNMENT boundary
+MAGIC = b'P3DT'
+VERSION = 1
+HEADER = struct.Struct('<4sHHdQ')  # magic, version, rumble segments, segment length, segment count
+ALIGNMENT = 16
+
+def ease(start, end, percent):
+    """Eases from start to end (percent may be an array)"""
+    return start + (end - start) * (0.5 - np.cos(percent * math.pi) / 2)
+
+def array_offsets(count):
+    """Returns the file offsets of the curve, world_y and color_index arrays"""
+    def align(offset):
+        return -(-offset // ALIGNMENT) * ALIGNMENT
+    curve = align(HEADER.size)
+    world_y = align(curve + 4 * count)
+    color_index = align(world_y + 4 * count)
+    return curve, world_y, color_index
+
+def section_arrays(section, height):
+    """Returns the per-segment curve and height arrays of a section starting at the given height"""
+    length = int(section['length'])
+    if length <= 0:
+        raise ValueError(f"section length must be positive: {section}")
+    curve = float(section.get('curve', 0))
+    hill = float(section.get('hill', 0))
+
+    # Bend: ease in over the first quarter, hold, ease out over the last quarter
+    percent = (np.arange(length) + 0.5) / length
+    edge = 0.25
+    strength = np.ones(length)
+    strength[percent < edge] = ease(0, 1, percent[percent < edge] / edge)
+    strength[percent > 1 - edge] = ease(0, 1, (1 - percent[percent > 1 - edge]) / edge)
+
+    # Height of the near edge of every segment
+    heights = ease(height, height + hill, np.arange(length) / length)
+
+    return curve * strength, heights
+
+def band_colors(index, rumble_segments=RUMBLE_SEGMENTS):
+    """Returns the light/dark color of segments by number, with the start band on the first ones"""
+    color_index = np.where((index // rumble_segments) % 2, COLOR_DARK, COLOR_LIGHT).astype(np.uint8)
+    color_index[index < rumble_segments] = COLOR_START
+    return color_index
+
+def compile_sections(sections, rumble_segments=RUMBLE_SEGMENTS):
+    """Builds the per-segment curve, height and color arrays of a list of sections"""
+    curves, heights = [], []
+    height = 0.0
+    for section in sections:
+        section_curve, section_heights = section_arrays(section, height)
+        curves.append(section_curve)
+        heights.append(section_heights)
+        height += float(section.get('hill', 0))
+
+    # The track loops, so it has to end at the height it started at
+    if abs(height) > 1e-6:
+        raise ValueError(f"hills add up to {height:g}, the track must end at height 0")
+
+    curve = np.concatenate(curves).astype(np.float32)
+    world_y = np.concatenate(heights).astype(np.float32)
+
+    # Alternately color the groups of segments light and dark, with start and finish bands at the ends
+    color_index = band_colors(np.arange(len(curve)), rumble_segments)
+    color_index[-rumble_segments:] = COLOR_FINISH
+
+    return curve, world_y, color_index
+
+def compile_track(sections, path, segment_length=SEGMENT_LENGTH, rumble_segments=RUMBLE_SEGMENTS):
+    """Compiles a list of sections into a binary track file"""
+    curve, world_y, color_index = compile_sections(sections, rumble_segments)
+    count = len(curve)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rumble_segments, segment_length, count))
+        for offset, array in zip(array_offsets(count), (curve, world_y, color_index)):
+            f.seek(offset)
+            f.write(array.tobytes())
+
+def endless_sections(seed=None):
+    """Yields random sections forever, keeping the road within ENDLESS_MAX_HEIGHT of height 0"""
+    rng = random.Random(seed)
+    height = 0
+    while True:
+        section = {
+            'length': rng.randint(50, 300),
+            'curve': rng.choice((0, 0, -1, 1, -2, 2, -3, 3)),
+            'hill': rng.choice((0, 0, -1500, 1500, -3000, 3000))
+        }
+        if abs(height + section['hill']) > ENDLESS_MAX_HEIGHT:
+            section['hill'] = -section['hill']
+        height += section['hill']
+        yield section
+
+def random_sections(segments, seed=None):
+    """Returns random sections adding up to the given number of segments"""
+    sections = []
+
+    # A straight closing section brings the road back to height 0
+    closing = min(segments, 200)
+    remaining = segments - closing
+    for section in endless_sections(seed):
+        if remaining <= 0:
+            break
+        section['length'] = min(section['length'], remaining)
+        sections.append(section)
+        remaining -= section['length']
+    sections.append({'length': closing, 'hill': -sum(section['hill'] for section in sections)})
+    return sections
+
+# Compiled track, memory-mapped
+class Track:
+    def __init__(self, path):
+        self.path = path
+
+        # The whole file is mapped once; the arrays are views into it
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, self.rumble_segments, self.segment_length, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} track")
+        self.total_segments = count
+
+        curve, world_y, color_index = array_offsets(count)
+        self.curve = self.data[curve:curve + 4 * count].view(np.float32)
+        self.world_y = self.data[world_y:world_y + 4 * count].view(np.float32)
+        self.color_index = self.data[color_index:color_index + count]
+
+    def advance(self, player_segment):
+        """Nothing to do: the whole track is mapped"""
+
+# Endless track streamed into a ring of segments
+#
+# The ring holds `capacity` segments and is used like a looping track of that length: the player,
+# camera and cars wrap around it as usual. Segment n of the endless road lives in slot
+# n % capacity, starting from a flat lead-in of `behind` segments before segment 0, and whenever
+# the player moves on, the slots more than `behind` segments behind them are rewritten with the
+# next segments of the road, so the ring always holds the road from a little behind the player to
+# the end of the view. Memory and per-frame work never grow.
+class StreamedTrack:
+    def __init__(self, seed, capacity, behind, segment_length=SEGMENT_LENGTH, rumble_segments=RUMBLE_SEGMENTS):
+        self.segment_length = segment_length
+        self.rumble_segments = rumble_segments
+        self.total_segments = capacity
+        self.behind = behind
+
+        # The ring, indexed by slot
+        self.curve = np.zeros(capacity, dtype=np.float32)
+        self.world_y = np.zeros(capacity, dtype=np.float32)
+        self.color_index = np.zeros(capacity, dtype=np.uint8)
+
+        # Section generator, and the section being written with how much of it is written
+        self.sections = endless_sections(seed)
+        self.height = 0.0
+        self.pending_curve = np.zeros(0)
+        self.pending_y = np.zeros(0)
+        self.pending_start = 0
+
+        # Road segments written so far, and the road segment the player is on
+        self.generated = 0
+        self.position = 0
+
+        # The slots behind the start hold a flat, straight lead-in (road segments -behind .. -1), so
+        # the camera behind the player sees road from the first frame
+        lead_in = slice(capacity - behind, capacity)
+        self.color_index[lead_in] = band_colors(np.arange(-behind, 0), rumble_segments)
+        self.fill(capacity - behind)
+
+    def fill(self, count):
+        """Writes the next count segments of the road into the ring"""
+        capacity = self.total_segments
+        while count > 0:
+            if self.pending_start == len(self.pending_curve):
+                section = next(self.sections)
+                self.pending_curve, self.pending_y = section_arrays(section, self.height)
+                self.pending_start = 0
+                self.height += section['hill']
+
+            # Copy as much as fits before the end of the section or the end of the ring
+            slot = self.generated % capacity
+            n = min(count, len(self.pending_curve) - self.pending_start, capacity - slot)
+            pending = slice(self.pending_start, self.pending_start + n)
+            self.curve[slot:slot + n] = self.pending_curve[pending]
+            self.world_y[slot:slot + n] = self.pending_y[pending]
+            self.color_index[slot:slot + n] = band_colors(np.arange(self.generated, self.generated + n),
+                                                          self.rumble_segments)
+
+            self.pending_start += n
+            self.generated += n
+            count -= n
+
+    def advance(self, player_segment):
+        """Recycles the slots that fell behind the player (player_segment is the player's slot)"""
+        capacity = self.total_segments
+        self.position += (player_segment - self.position) % capacity
+        needed = self.position + capacity - self.behind - self.generated
+        if needed > 0:
+            self.fill(needed)
+
+def compiled_path(path):
+    """Returns the binary track file for a track description"""
+    return os.path.splitext(path)[0] + '.trk'
+
+def load_track(path):
+    """Maps a compiled track, compiling a JSON description first if its binary is missing or stale"""
+    if path.endswith('.json'):
+        description = path
+        path = compiled_path(description)
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(description):
+            with open(description) as f:
+                compile_track(json.load(f)['sections'], path)
+    return Track(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a track description into a binary track")
+    parser.add_argument('description', nargs='?', help="JSON track description")
+    parser.add_argument('-o', '--output', help="binary track file (default: next to the description)")
+    parser.add_argument('--random', type=int, metavar='SEGMENTS', help="compile a random track of this many segments")
+    parser.add_argument('--seed', type=int, help="seed for --random")
+    args = parser.parse_args()
+
+    if args.random:
+        sections = random_sections(args.random, args.seed)
+        output = args.output or 'tracks/random.trk'
+    elif args.description:
+        with open(args.description) as f:
+            sections = json.load(f)['sections']
+        output = args.output or compiled_path(args.description)
+    else:
+        parser.error("give a track description or --random")
+
+    compile_track(sections, output)
+    track = Track(output)
+    print(f"{output}: {track.total_segments} segments, {os.path.getsize(output) / 1024:.1f} KiB")
+
+if __name__ == "__main__":
+    main()